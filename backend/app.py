@@ -1,22 +1,71 @@
+import os
 from flask import Flask
 from flask_cors import CORS
-from flasgger import Swagger
 
+from config import settings
+from database import enable_slow_query_log
+from migrations import run_migrations
+from utils.api_docs import init_api_docs
+from utils.metrics import init_metrics
+from utils.tag_bitmaps import warm_tag_bitmaps
 from routes.tags import tags_bp
 from routes.files import files_bp
 from routes.folders import folders_bp
+from routes.uploads import uploads_bp
+from routes.metrics import metrics_bp
 # Additional blueprints can be added here: folders_bp, search_bp, etc.
 
-app = Flask(__name__)
-swagger = Swagger(app)
-CORS(app)
+def create_app():
+    """
+    Build the Flask application with every blueprint registered.
 
-# Register blueprints
-app.register_blueprint(tags_bp, url_prefix="/api/tags")
-app.register_blueprint(files_bp, url_prefix="/api/files")
-app.register_blueprint(folders_bp, url_prefix="/api/folders")
+    The database schema is brought up to date and the upload folder created first.
 
-# Start the server
+    Example:
+        >>> from app import create_app
+        >>> app = create_app()
+    """
+    # Bring the database schema up to date before serving requests
+    run_migrations()
+    os.makedirs(settings["UPLOAD_DIR"], exist_ok=True)
+
+    app = Flask(__name__)
+    app.config.update(settings)
+    init_api_docs(app, settings["API_DOCS"])
+    init_metrics(app, settings["METRICS"])
+    if settings["SLOW_QUERY_MS"] > 0:
+        enable_slow_query_log(settings["SLOW_QUERY_MS"], settings["SLOW_QUERY_LOG"], settings["SLOW_QUERY_SAMPLE"])
+    CORS(app)
+    register_blueprints(app)
+
+    return app
+
+def register_blueprints(app):
+    """Mount every API blueprint on an app."""
+    app.register_blueprint(tags_bp, url_prefix="/api/tags")
+    app.register_blueprint(files_bp, url_prefix="/api/files")
+    app.register_blueprint(folders_bp, url_prefix="/api/folders")
+    app.register_blueprint(uploads_bp, url_prefix="/api/files/uploads")
+    app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
+
+def warm_up(app):
+    """
+    Get a freshly started worker ready before it takes traffic.
+
+    Fills the process-wide in-memory caches (tag bitmaps, tag dictionary, folder
+    tree) and compiles the URL map, so real clients never pay for them.
+
+    Database connections are per thread: the connection opened here serves
+    requests only on a sync worker, which handles them on this same thread.
+    The request threads of a gthread worker each open their own connection
+    on their first request (about a millisecond; nothing else to fill).
+    """
+    warm_tag_bitmaps()
+    client = app.test_client()
+    client.get("/api/tags")
+    client.get("/api/folders/tree")
+
+# Start the development server (use serve.py in production)
 if __name__ == "__main__":
+    app = create_app()
     app.run(debug=True)
-
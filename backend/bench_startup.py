@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+'''
+Startup benchmark for the API_DOCS modes (see utils/api_docs.py).
+
+Usage:
+    python build_openapi.py       # static mode needs the prebuilt spec
+    python bench_startup.py --runs 5
+
+Each run is a fresh interpreter that imports the app, builds it with
+create_app() and fetches the spec once, like a newly forked worker answering
+its first docs request. Reported: median time to a ready app, median time of
+the first spec request, and the peak memory of the process.
+'''
+
+MODES = ("live", "static", "off")
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, time, resource
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+ready = time.perf_counter()
+status = app.test_client().get("/apispec_1.json").status_code
+spec_done = time.perf_counter()
+print(json.dumps({
+    "startup_ms": (ready - started) * 1000,
+    "spec_ms": (spec_done - ready) * 1000,
+    "spec_status": status,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+def run_probe(mode):
+    env = dict(os.environ, API_DOCS=mode)
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup time and memory of the API_DOCS modes")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per mode")
+    args = parser.parse_args()
+
+    print(f"{'mode':>7} {'startup ms':>11} {'1st spec ms':>12} {'spec':>5} {'max RSS MB':>11}")
+    for mode in MODES:
+        results = [run_probe(mode) for _ in range(args.runs)]
+        print(
+            f"{mode:>7} {median(r['startup_ms'] for r in results):>11.1f}"
+            f" {median(r['spec_ms'] for r in results):>12.1f}"
+            f" {results[0]['spec_status']:>5}"
+            f" {median(r['max_rss_mb'] for r in results):>11.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from flask import Flask
+from app import register_blueprints
+from utils.api_docs import STATIC_SPEC_PATH, build_static_spec
+
+'''
+Prebuild the OpenAPI spec from the route docstrings into openapi.json.
+
+Usage:
+    python build_openapi.py
+    API_DOCS=static python serve.py     # serve it without loading flasgger
+
+Rerun after changing a route's docstring. Needs flasgger; the database is not touched.
+'''
+
+app = Flask(__name__)
+register_blueprints(app)
+spec = build_static_spec(app)
+
+print(f"✅ Wrote {len(spec.get('paths', {}))} paths to {STATIC_SPEC_PATH}")
@@ -0,0 +1,84 @@
+import os
+import json
+
+'''
+Project configuration (database path, upload folder, server settings).
+
+Values are read once at import, in increasing priority from:
+    1. DEFAULTS below
+    2. a JSON file named by the APP_CONFIG environment variable, e.g.
+       {"DATABASE_PATH": "/srv/scores/library.db", "UPLOAD_DIR": "/srv/scores/uploads"}
+    3. environment variables with the same names (WORKERS=4 python serve.py)
+
+Paths are made absolute: relative paths in the config file are taken relative
+to the file, relative paths from the environment relative to the working directory.
+'''
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULTS = {
+    "DATABASE_PATH": os.path.join(BASE_DIR, "mydatabase.db"),
+    "UPLOAD_DIR": os.path.join(BASE_DIR, "uploads"),
+    # How GET /api/files/<id>/content hands out bytes (see routes/files.py)
+    "FILE_SERVE_MODE": "direct",
+    "X_ACCEL_PREFIX": "/protected-uploads/",
+    # Chunked uploads idle for longer are deleted (see routes/uploads.py)
+    "UPLOAD_SESSION_TTL_HOURS": 24,
+    # API documentation: "live", "static" or "off" (see utils/api_docs.py)
+    "API_DOCS": "live",
+    # Request and SQL metrics at /api/metrics: "on" or "off" (see utils/metrics.py)
+    "METRICS": "off",
+    # Slow-query log (see enable_slow_query_log in database.py); 0 disables it
+    "SLOW_QUERY_MS": 0,
+    "SLOW_QUERY_LOG": os.path.join(BASE_DIR, "slow_queries.log"),
+    "SLOW_QUERY_SAMPLE": 1,
+    # serve.py
+    "HOST": "127.0.0.1",
+    "PORT": 5000,
+    "WORKERS": os.cpu_count() or 1,
+    "THREADS": 4,
+}
+
+PATH_KEYS = ("DATABASE_PATH", "UPLOAD_DIR", "SLOW_QUERY_LOG")
+
+def load_config(environ=os.environ):
+    """
+    Merge the defaults, the APP_CONFIG file and the environment.
+
+    Returns:
+        dict: Setting name -> value (integers for the numeric settings).
+
+    Raises:
+        ValueError: If the config file contains an unknown setting or a value has the wrong type.
+    """
+    settings = dict(DEFAULTS)
+
+    config_file = environ.get("APP_CONFIG")
+    if config_file:
+        with open(config_file, encoding="utf-8") as f:
+            from_file = json.load(f)
+        unknown = set(from_file) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown settings in {config_file}: {', '.join(sorted(unknown))}")
+        base = os.path.dirname(os.path.abspath(config_file))
+        for key in PATH_KEYS:
+            if key in from_file:
+                from_file[key] = os.path.join(base, from_file[key])
+        settings.update(from_file)
+
+    for key in DEFAULTS:
+        if key in environ:
+            settings[key] = environ[key]
+
+    for key, default in DEFAULTS.items():
+        if isinstance(default, int):
+            try:
+                settings[key] = int(settings[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be an integer, got {settings[key]!r}")
+
+    for key in PATH_KEYS:
+        settings[key] = os.path.abspath(settings[key])
+    return settings
+
+settings = load_config()
@@ -1,23 +1,322 @@
 import sqlite3
 import os
+import re
+import time
+import random
+import logging
+import threading
 from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from config import settings
+
+DATABASE_PATH = settings["DATABASE_PATH"]  # Path to the SQLite database file (see config.py)
+
+# Pragmas applied once when a connection is opened (not on every request)
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",       # Readers no longer block the writer
+    "PRAGMA synchronous = NORMAL;",     # Safe with WAL, avoids an fsync per commit
+    "PRAGMA foreign_keys = ON;",        # Enable foreign key constraints
+    "PRAGMA busy_timeout = 5000;",      # Wait up to 5s for a lock instead of failing
+    "PRAGMA cache_size = -16000;",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456;",    # Memory-map up to 256 MB of the database
+    "PRAGMA temp_store = MEMORY;",
+)
+
+# Keep IN (...) lists below SQLite's default host parameter limit on older builds
+SQL_BATCH_SIZE = 500
+
+# One connection per (process, thread); see _get_connection
+_local = threading.local()
+
+# Instrumentation hooks, empty unless a feature such as utils/metrics.py registers one.
+# QUERY_LISTENERS are called as listener(sql, parameters, seconds, rows) once a
+# statement run through a cursor is done (execute plus fetches). TRACE_CALLBACKS
+# get every statement SQLite runs (including each executemany row and trigger
+# bodies); they are attached to connections opened after registration.
+QUERY_LISTENERS = []
+TRACE_CALLBACKS = []
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including fetching its rows, for QUERY_LISTENERS."""
+
+    _pending = None  # [sql, parameters, seconds, rows] of the statement being consumed
+
+    def _report(self):
+        pending, self._pending = self._pending, None
+        if pending:
+            for listener in QUERY_LISTENERS:
+                listener(*pending)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending:
+                self._pending[2] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._report()
+        self._pending = [sql, parameters, 0.0, 0]
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._report()
+        self._pending = [sql, seq_of_parameters, 0.0, 0]
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._report()
+        elif self._pending:
+            self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._pending:
+            self._pending[3] += len(rows)
+        if len(rows) < size:
+            self._report()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending:
+            self._pending[3] += len(rows)
+        self._report()
+        return rows
+
+    def close(self):
+        self._report()
+        super().close()
+
+
+class _Connection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = InstrumentedCursor if QUERY_LISTENERS else sqlite3.Cursor
+        return super().cursor(factory)
+
+
+def _dispatch_trace(statement):
+    for callback in TRACE_CALLBACKS:
+        callback(statement)
+
+
+# Slow-query log (opt-in, see enable_slow_query_log)
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+_slow_query_logger = logging.getLogger("database.slow_queries")
+_slow_query_settings = {"seconds": None, "sample": 1, "path": None, "pid": None}
+_slow_query_lock = threading.Lock()
+
+
+def _is_parameter_set(parameters):
+    """False for the sequence (or iterator) of parameter sets given to executemany."""
+    if isinstance(parameters, dict):
+        return True
+    return isinstance(parameters, (list, tuple)) and not (
+        parameters and isinstance(parameters[0], (list, tuple, dict))
+    )
+
+
+def _parameter_shape(parameters):
+    """Describe bound parameters by type without their values, e.g. "(str*3, int)"."""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    if not _is_parameter_set(parameters):
+        if isinstance(parameters, (list, tuple)):
+            return f"{len(parameters)} x {_parameter_shape(parameters[0])} (executemany)"
+        return f"{type(parameters).__name__} (executemany)"
+
+    runs = []  # [type name, count], consecutive values of one type collapsed
+    for value in parameters:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name}*{count}" for name, count in runs) + ")"
+
+
+def _compact_sql(sql):
+    """Collapse whitespace and long placeholder lists (IN (?*120)) of a statement."""
+    sql = " ".join(sql.split())
+    return re.sub(
+        r"\?(?:\s*,\s*\?){3,}",
+        lambda match: f"?*{match.group().count('?')}",
+        sql,
+    )
+
+
+def _query_plan(sql, parameters):
+    """Return the EXPLAIN QUERY PLAN of a statement as indented lines."""
+    if not _is_parameter_set(parameters):
+        return ["(not available for executemany)"]
+
+    # A plain cursor, so the EXPLAIN itself is not reported to QUERY_LISTENERS
+    cursor = _get_connection().cursor(sqlite3.Cursor)
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters)
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in cursor.fetchall():
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node_id] + detail)
+        return lines or ["(empty plan)"]
+    except sqlite3.Error as e:
+        return [f"(not available: {e})"]
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(sql, parameters, seconds, rows):
+    threshold, sample = _slow_query_settings["seconds"], _slow_query_settings["sample"]
+    if threshold is None or seconds < threshold:
+        return
+    if sample > 1 and random.randrange(sample):
+        return
+
+    lines = [
+        f"{seconds * 1000:.1f} ms, {rows} rows: {_compact_sql(sql)}",
+        f"    params: {_parameter_shape(parameters)}",
+        "    plan:",
+    ]
+    lines += ["      " + line for line in _query_plan(sql, parameters)]
+    _open_slow_query_log()
+    _slow_query_logger.warning("\n".join(lines))
+
+
+def slow_query_log_path(path, pid):
+    """Return the slow-query log file of one process: slow_queries.log -> slow_queries.<pid>.log."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid}{ext}"
+
+
+def _open_slow_query_log():
+    """Point the slow-query logger at this process's own file, once per process (after fork)."""
+    pid = os.getpid()
+    if _slow_query_settings["pid"] == pid:
+        return
+    with _slow_query_lock:
+        if _slow_query_settings["pid"] == pid:
+            return
+        # Handlers inherited from the parent share its file; rotating it from several processes loses entries
+        for handler in list(_slow_query_logger.handlers):
+            _slow_query_logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(
+            slow_query_log_path(_slow_query_settings["path"], pid),
+            maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS,
+            encoding="utf-8", delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s pid=%(process)d %(message)s"))
+        _slow_query_logger.addHandler(handler)
+        _slow_query_settings["pid"] = pid
+
+
+def enable_slow_query_log(threshold_ms, path, sample=1):
+    """
+    Log every statement slower than threshold_ms to a rotating file.
+
+    An entry has the statement (whitespace and long placeholder lists
+    collapsed), the types of its bound parameters (never their values), the
+    time spent executing it and fetching its rows, the row count and its
+    EXPLAIN QUERY PLAN. The plan is taken after the statement ran, on the
+    same connection.
+
+    Args:
+        threshold_ms (int): Minimum duration of a logged statement in milliseconds.
+        path (str): Log file name; each process writes its own file with its pid
+            added (see slow_query_log_path), rotated at SLOW_QUERY_LOG_MAX_BYTES and
+            keeping SLOW_QUERY_LOG_BACKUPS old files.
+        sample (int): Log one in `sample` slow statements (at random) to bound the EXPLAIN overhead.
+
+    The file is opened on the first slow statement of a process, so prefork
+    workers never share (and rotate) one file.
+
+    Example:
+        >>> enable_slow_query_log(50, "/var/log/scores/slow_queries.log", sample=10)
+    """
+    if sample < 1:
+        raise ValueError(f"sample must be at least 1, got {sample!r}")
+    _slow_query_settings["seconds"] = threshold_ms / 1000
+    _slow_query_settings["sample"] = sample
+    _slow_query_settings["path"] = path
+    _slow_query_settings["pid"] = None  # (Re)opened by the next slow statement
+
+    _slow_query_logger.setLevel(logging.WARNING)
+    _slow_query_logger.propagate = False
+
+    if _log_slow_query not in QUERY_LISTENERS:
+        QUERY_LISTENERS.append(_log_slow_query)
+
+
+def _open_connection(path):
+    """Open a new SQLite connection with row access by column name and tuned pragmas."""
+    conn = sqlite3.connect(path, check_same_thread=False, factory=_Connection)
+    conn.row_factory = sqlite3.Row  # Enable column-name-based access for query results
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if TRACE_CALLBACKS:
+        conn.set_trace_callback(_dispatch_trace)
+    return conn
+
+
+def _get_connection():
+    """
+    Return the connection owned by the current thread, opening it on first use.
+
+    The connection is reopened if the process was forked (e.g. a prefork worker)
+    or if DATABASE_PATH was changed since it was opened.
+    """
+    pid = os.getpid()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == pid and _local.path == DATABASE_PATH:
+        return conn
+
+    if conn is not None and _local.pid == pid:
+        conn.close()
+
+    conn = _open_connection(DATABASE_PATH)
+    _local.conn = conn
+    _local.pid = pid
+    _local.path = DATABASE_PATH
+    return conn
+
+
+def close_db():
+    """Close the current thread's connection (if any). The next get_db() reopens it."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+def chunked(items, size=SQL_BATCH_SIZE):
+    """Yield successive slices of at most `size` items (for building IN (...) lists)."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "mydatabase.db")
-# DATABASE_PATH = "mydatabase.db"  # Path to the generated SQLite database file
 
 @contextmanager
 def get_db():
     """
     Get a SQLite database connection with foreign key support enabled.
 
+    The connection is kept open and reused by the same thread across requests;
+    each block runs in its own transaction.
+
     Usage:
         with get_db() as (conn, cursor):
             cursor.execute(...)
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Enable column-name-based access for query results
-    conn.execute("PRAGMA foreign_keys = ON;")  # Enable foreign key constraints
+    conn = _get_connection()
     cursor = conn.cursor()
 
     try:
@@ -27,7 +326,7 @@ def get_db():
         conn.rollback()
         raise e
     finally:
-        conn.close()
+        cursor.close()
 
 '''
 Example:
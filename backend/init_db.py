@@ -1,10 +1,10 @@
-import sqlite3
-
-# Connect to the SQLite database (will automatically create mydatabase.db if it doesn't exist)
-conn = sqlite3.connect("mydatabase.db")
-cursor = conn.cursor()
+from database import DATABASE_PATH
+from migrations import run_migrations, LATEST_VERSION
 
 '''
+Create or upgrade the database by applying the numbered migrations in
+migrations/ (the app also does this at startup).
+
 *files*
     id
     name
@@ -34,72 +34,15 @@ cursor = conn.cursor()
 *file_tags*
     file_id
     tag_id
-'''
-
-# Create the files table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS files (
-    id TEXT PRIMARY KEY,
-    name TEXT NOT NULL,
-    upload_path TEXT NOT NULL,
-    size BIGINT,
-    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-""")
-
-# Create the folders table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS folders (
-    id TEXT PRIMARY KEY,
-    name TEXT NOT NULL,
-    parent_id TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (parent_id) REFERENCES folders(id)
-);
-""")
 
-# Create the file_folders table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS file_folders (
-    file_id TEXT,
-    folder_id TEXT,
-    PRIMARY KEY (file_id, folder_id),
-    FOREIGN KEY (file_id) REFERENCES files(id),
-    FOREIGN KEY (folder_id) REFERENCES folders(id)
-);
-""")
-
-# Create the tags table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS tags (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    category TEXT NOT NULL
-);
-""")
-
-# Create the tag_aliases table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS tag_aliases (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    tag_id INTEGER NOT NULL,
-    alias TEXT NOT NULL,
-    FOREIGN KEY (tag_id) REFERENCES tags(id)
-);
-""")
-
-# Create the file_tags table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS file_tags (
-    file_id TEXT,
-    tag_id INTEGER,
-    PRIMARY KEY (file_id, tag_id),
-    FOREIGN KEY (file_id) REFERENCES files(id),
-    FOREIGN KEY (tag_id) REFERENCES tags(id)
-);
-""")
+*folder_paths* (closure table of the folder hierarchy, see utils/folder_paths.py)
+    ancestor_id
+    descendant_id
+    depth
+'''
 
-# Commit the changes and close the connection
-conn.commit()
-conn.close()
-print("✅ All tables have been successfully created (mydatabase.db)")
+applied = run_migrations()
+if applied:
+    print(f"✅ Applied migrations {applied}, schema is at version {LATEST_VERSION} ({DATABASE_PATH})")
+else:
+    print(f"✅ Schema already at version {LATEST_VERSION} ({DATABASE_PATH})")
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+import http.client
+from multiprocessing import Pool
+
+'''
+Load test: measures throughput of serve.py for several worker counts.
+
+Usage:
+    python loadtest.py                                # 1, 2 and 4 workers, 10 s each
+    python loadtest.py --workers 1,2,4,8 --threads 4 --clients 32 --duration 20
+
+For each worker count a server is started on a free port against the
+configured database (read-only traffic), hammered by --clients client
+processes with keep-alive connections, then stopped. The request mix covers
+the cached endpoints and a database-backed file listing.
+'''
+
+BASE_PORT = 5100
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure throughput against the number of workers")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--path", action="append", help="request path (repeatable, default: built-in mix)")
+    return parser.parse_args()
+
+def wait_until_ready(port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/tags")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+def default_paths(port):
+    """Cached endpoints plus a file listing filtered by the first tag."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/api/tags")
+    tags = json.loads(conn.getresponse().read())["data"]
+    paths = ["/api/tags", "/api/folders/tree"]
+    if tags:
+        paths.append(f"/api/files?tag_ids={tags[-1]['id']}&size=20")
+    return paths
+
+def run_client(job):
+    """Send requests round-robin over the paths until the deadline; returns (count, errors, latencies)."""
+    port, paths, deadline = job
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    count = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        path = paths[count % len(paths)]
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        latencies.append(time.perf_counter() - started)
+        count += 1
+    return count, errors, latencies
+
+def measure(workers, args, port):
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--threads", str(args.threads), "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port)
+        paths = args.path or default_paths(port)
+        deadline = time.time() + args.duration
+        with Pool(args.clients) as pool:
+            results = pool.map(run_client, [(port, paths, deadline)] * args.clients)
+    finally:
+        server.terminate()
+        server.wait()
+
+    count = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return count / args.duration, errors, percentile(0.5), percentile(0.99)
+
+def main():
+    args = parse_args()
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for i, workers in enumerate(worker_counts):
+        rate, errors, p50, p99 = measure(workers, args, BASE_PORT + i)
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:>10.0f} {rate / baseline:>7.2f}x {p50:>8.2f} {p99:>8.2f} {errors:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+'''
+Numbered schema migrations tracked with SQLite's PRAGMA user_version.
+
+Each migration is a module in this package exposing `upgrade(cursor)`.
+To add one, create the next numbered module and append it to MIGRATIONS;
+never edit a migration that has already shipped.
+
+upgrade() may return a callable to run once its transaction has committed,
+for work that cannot be rolled back (e.g. deleting files it replaced).
+'''
+
+import importlib
+from database import get_db
+
+MIGRATIONS = [
+    (1, "m001_initial"),
+    (2, "m002_folder_paths"),
+    (3, "m003_indexes"),
+    (4, "m004_upload_sessions"),
+    (5, "m005_blobs"),
+    (6, "m006_file_text"),
+    (7, "m007_tag_search"),
+    (8, "m008_tag_index_log"),
+    (9, "m009_relative_paths"),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(cursor):
+    """Return the schema version recorded in the database file (0 for a new database)."""
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def run_migrations():
+    """
+    Apply every migration newer than the database's user_version.
+
+    Each migration runs in its own IMMEDIATE transaction together with the
+    user_version bump, so a failed migration leaves the previous version intact
+    and concurrent workers starting at the same time apply it only once.
+
+    Returns:
+        list: Versions that were applied by this call.
+
+    Example:
+        >>> from migrations import run_migrations
+        >>> run_migrations()
+        [1, 2, 3]
+    """
+    applied = []
+    for version, module_name in MIGRATIONS:
+        after_commit = None
+        with get_db() as (conn, cursor):
+            if get_schema_version(cursor) >= version:
+                continue
+
+            cursor.execute("BEGIN IMMEDIATE")
+            # Re-check under the write lock in case another process got here first
+            if get_schema_version(cursor) >= version:
+                continue
+
+            module = importlib.import_module(f"{__name__}.{module_name}")
+            after_commit = module.upgrade(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            applied.append(version)
+
+        if after_commit:
+            after_commit()
+    return applied
@@ -0,0 +1,70 @@
+'''
+The six original tables (see the table designs in README.md).
+
+Uses IF NOT EXISTS so databases created by the old init_db.py adopt version 1
+without changes.
+'''
+
+def upgrade(cursor):
+    # Create the files table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS files (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        upload_path TEXT NOT NULL,
+        size BIGINT,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Create the folders table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS folders (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        parent_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (parent_id) REFERENCES folders(id)
+    );
+    """)
+
+    # Create the file_folders table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS file_folders (
+        file_id TEXT,
+        folder_id TEXT,
+        PRIMARY KEY (file_id, folder_id),
+        FOREIGN KEY (file_id) REFERENCES files(id),
+        FOREIGN KEY (folder_id) REFERENCES folders(id)
+    );
+    """)
+
+    # Create the tags table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL
+    );
+    """)
+
+    # Create the tag_aliases table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tag_aliases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tag_id INTEGER NOT NULL,
+        alias TEXT NOT NULL,
+        FOREIGN KEY (tag_id) REFERENCES tags(id)
+    );
+    """)
+
+    # Create the file_tags table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS file_tags (
+        file_id TEXT,
+        tag_id INTEGER,
+        PRIMARY KEY (file_id, tag_id),
+        FOREIGN KEY (file_id) REFERENCES files(id),
+        FOREIGN KEY (tag_id) REFERENCES tags(id)
+    );
+    """)
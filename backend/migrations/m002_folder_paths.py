@@ -0,0 +1,24 @@
+'''
+Closure table of the folder hierarchy (see utils/folder_paths.py), backfilled
+from folders.parent_id.
+'''
+
+from utils.folder_paths import rebuild_folder_paths
+
+def upgrade(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS folder_paths (
+        ancestor_id TEXT NOT NULL,
+        descendant_id TEXT NOT NULL,
+        depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_id, descendant_id),
+        FOREIGN KEY (ancestor_id) REFERENCES folders(id),
+        FOREIGN KEY (descendant_id) REFERENCES folders(id)
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_folder_paths_descendant
+    ON folder_paths (descendant_id, depth);
+    """)
+
+    rebuild_folder_paths(cursor)
@@ -0,0 +1,24 @@
+'''
+Secondary indexes for the hot route queries.
+
+- file_tags(tag_id, file_id): tag intersection GROUP BY in list_files
+- file_folders(folder_id, file_id): folder filters in list_files, delete_folder
+- folders(parent_id, name): children lookup and duplicate-name check in create_folder
+- tag_aliases(alias), tag_aliases(tag_id): alias conflict checks and alias hydration
+- tags(name, category): duplicate check in create_tag
+- files(uploaded_at, id): ordering and cursor pagination in list_files
+'''
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_file_tags_tag ON file_tags (tag_id, file_id)",
+    "CREATE INDEX IF NOT EXISTS idx_file_folders_folder ON file_folders (folder_id, file_id)",
+    "CREATE INDEX IF NOT EXISTS idx_folders_parent_name ON folders (parent_id, name)",
+    "CREATE INDEX IF NOT EXISTS idx_tag_aliases_alias ON tag_aliases (alias)",
+    "CREATE INDEX IF NOT EXISTS idx_tag_aliases_tag ON tag_aliases (tag_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tags_name_category ON tags (name, category)",
+    "CREATE INDEX IF NOT EXISTS idx_files_uploaded_at ON files (uploaded_at, id)",
+]
+
+def upgrade(cursor):
+    for sql in INDEXES:
+        cursor.execute(sql)
@@ -0,0 +1,23 @@
+'''
+Resumable chunked uploads (see routes/uploads.py).
+
+- files.sha256: content hash computed while the upload streams in
+- upload_sessions: one row per in-progress upload; `received` is the last
+  acknowledged byte offset of the temp file
+'''
+
+def upgrade(cursor):
+    cursor.execute("ALTER TABLE files ADD COLUMN sha256 TEXT")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        size BIGINT,
+        tags TEXT NOT NULL DEFAULT '[]',
+        folders TEXT NOT NULL DEFAULT '[]',
+        temp_path TEXT NOT NULL,
+        received BIGINT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
@@ -0,0 +1,67 @@
+'''
+Content-addressed blob storage (see utils/blobstore.py).
+
+Creates the blobs table, then rehashes every existing upload, moves each
+distinct content to its blob path and points files.upload_path/sha256 at it.
+The original copies are removed once the migration has committed, so a failed
+migration leaves every file where it was. Files whose content is missing on
+disk are left untouched (sha256 stays NULL).
+'''
+
+import os
+import shutil
+from utils.blobstore import blob_path, hash_file, legacy_path, resolve_path
+
+def upgrade(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size BIGINT NOT NULL,
+        ref_count INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256)")
+
+    cursor.execute("SELECT id, upload_path FROM files")
+    rows = cursor.fetchall()
+
+    ref_counts = {}
+    sizes = {}
+    old_paths = set()
+    for row in rows:
+        if not row["upload_path"]:
+            continue
+        old_path = legacy_path(row["upload_path"])
+        if not os.path.isfile(old_path):
+            continue
+
+        sha256, size = hash_file(old_path)
+        new_path = resolve_path(blob_path(sha256))
+        if not os.path.exists(new_path):
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            # Copy (or hard link); the originals are removed after commit
+            try:
+                os.link(old_path, new_path)
+            except OSError:
+                shutil.copy2(old_path, new_path)
+
+        cursor.execute(
+            "UPDATE files SET upload_path = ?, sha256 = ? WHERE id = ?",
+            (blob_path(sha256), sha256, row["id"])
+        )
+        ref_counts[sha256] = ref_counts.get(sha256, 0) + 1
+        sizes[sha256] = size
+        if os.path.abspath(old_path) != os.path.abspath(new_path):
+            old_paths.add(old_path)
+
+    cursor.executemany(
+        "INSERT INTO blobs (sha256, path, size, ref_count) VALUES (?, ?, ?, ?)",
+        [(sha256, blob_path(sha256), sizes[sha256], count) for sha256, count in ref_counts.items()]
+    )
+
+    def remove_originals():
+        for old_path in old_paths:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+    return remove_originals
@@ -0,0 +1,27 @@
+'''
+Full-text index over PDF contents (see utils/text_index.py).
+
+- file_text_state: one row per file whose text has been extracted (status
+  indexed / empty / failed); its id is the rowid of the file's file_text row
+- file_text: FTS5 table holding the extracted text. The trigram tokenizer
+  matches substrings in any script (including CJK lyrics and titles); SQLite
+  builds older than 3.34 fall back to unicode61.
+'''
+
+import sqlite3
+
+def upgrade(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS file_text_state (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_id TEXT NOT NULL UNIQUE,
+        status TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (file_id) REFERENCES files(id)
+    );
+    """)
+
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS file_text USING fts5(content, tokenize = 'trigram')")
+    except sqlite3.OperationalError:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS file_text USING fts5(content, tokenize = 'unicode61')")
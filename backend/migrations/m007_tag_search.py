@@ -0,0 +1,58 @@
+'''
+Trigram index over tag names and aliases for GET /api/tags?q=.
+
+tag_search holds one row per tag name (rowid = 2 * tags.id) and one per alias
+(rowid = 2 * tag_aliases.id + 1), so triggers can keep it in sync with
+rowid lookups. kind is 'name' or 'alias'.
+'''
+
+def upgrade(cursor):
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS tag_search
+    USING fts5(term, tag_id UNINDEXED, kind UNINDEXED, tokenize = 'trigram')
+    """)
+
+    # Keep tag_search in sync with tags
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tags_search_insert AFTER INSERT ON tags BEGIN
+        INSERT INTO tag_search (rowid, term, tag_id, kind) VALUES (new.id * 2, new.name, new.id, 'name');
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tags_search_update AFTER UPDATE OF name ON tags BEGIN
+        UPDATE tag_search SET term = new.name WHERE rowid = old.id * 2;
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tags_search_delete AFTER DELETE ON tags BEGIN
+        DELETE FROM tag_search WHERE rowid = old.id * 2;
+    END;
+    """)
+
+    # Keep tag_search in sync with tag_aliases
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_aliases_search_insert AFTER INSERT ON tag_aliases BEGIN
+        INSERT INTO tag_search (rowid, term, tag_id, kind) VALUES (new.id * 2 + 1, new.alias, new.tag_id, 'alias');
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_aliases_search_update AFTER UPDATE OF alias, tag_id ON tag_aliases BEGIN
+        UPDATE tag_search SET term = new.alias, tag_id = new.tag_id WHERE rowid = old.id * 2 + 1;
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_aliases_search_delete AFTER DELETE ON tag_aliases BEGIN
+        DELETE FROM tag_search WHERE rowid = old.id * 2 + 1;
+    END;
+    """)
+
+    # Backfill
+    cursor.execute("DELETE FROM tag_search")
+    cursor.execute("""
+        INSERT INTO tag_search (rowid, term, tag_id, kind)
+        SELECT id * 2, name, id, 'name' FROM tags
+    """)
+    cursor.execute("""
+        INSERT INTO tag_search (rowid, term, tag_id, kind)
+        SELECT id * 2 + 1, alias, tag_id, 'alias' FROM tag_aliases
+    """)
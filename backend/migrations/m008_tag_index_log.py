@@ -0,0 +1,46 @@
+'''
+Change log for the in-memory tag bitmap index (see utils/tag_bitmaps.py).
+
+Triggers append one row per inserted or deleted file (tag_id NULL) and per
+added or removed file_tags binding, inside the writing transaction. Each worker
+replays the rows after the `seq` its index has seen instead of rebuilding the
+whole index. Every 1000th row prunes the log to its last 50000 rows; a worker
+that falls further behind rebuilds.
+'''
+
+def upgrade(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tag_index_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_id TEXT NOT NULL,
+        tag_id INTEGER
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS files_tag_index_insert AFTER INSERT ON files BEGIN
+        INSERT INTO tag_index_log (file_id) VALUES (new.id);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS files_tag_index_delete AFTER DELETE ON files BEGIN
+        INSERT INTO tag_index_log (file_id) VALUES (old.id);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS file_tags_tag_index_insert AFTER INSERT ON file_tags BEGIN
+        INSERT INTO tag_index_log (file_id, tag_id) VALUES (new.file_id, new.tag_id);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS file_tags_tag_index_delete AFTER DELETE ON file_tags BEGIN
+        INSERT INTO tag_index_log (file_id, tag_id) VALUES (old.file_id, old.tag_id);
+    END;
+    """)
+
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_index_log_prune AFTER INSERT ON tag_index_log
+    WHEN new.seq % 1000 = 0 BEGIN
+        DELETE FROM tag_index_log WHERE seq <= new.seq - 50000;
+    END;
+    """)
@@ -0,0 +1,36 @@
+'''
+Store files.upload_path and blobs.path relative to UPLOAD_DIR.
+
+m005 used to write absolute blob paths, which exposed the server's layout in
+the API and broke when UPLOAD_DIR moved. Paths of files whose content m005
+could not find are still relative to the backend folder; they are rewritten
+too. Paths outside UPLOAD_DIR stay absolute.
+'''
+
+import os
+from utils.blobstore import UPLOAD_DIR, legacy_path
+
+def relative_to_uploads(path):
+    """Return an absolute path relative to UPLOAD_DIR, or unchanged if it lies outside."""
+    try:
+        relative = os.path.relpath(path, UPLOAD_DIR)
+    except ValueError:  # Another drive on Windows
+        return path
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return path
+    return relative.replace(os.sep, "/")
+
+def upgrade(cursor):
+    cursor.execute("SELECT sha256, path FROM blobs")
+    cursor.executemany("UPDATE blobs SET path = ? WHERE sha256 = ?", [
+        (relative_to_uploads(row["path"]), row["sha256"])
+        for row in cursor.fetchall() if os.path.isabs(row["path"])
+    ])
+
+    # Files without sha256 predate m005 and keep their original (backend-relative) path
+    cursor.execute("SELECT id, upload_path, sha256 FROM files")
+    cursor.executemany("UPDATE files SET upload_path = ? WHERE id = ?", [
+        (relative_to_uploads(legacy_path(row["upload_path"])), row["id"])
+        for row in cursor.fetchall()
+        if row["upload_path"] and (os.path.isabs(row["upload_path"]) or row["sha256"] is None)
+    ])
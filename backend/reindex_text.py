@@ -0,0 +1,54 @@
+import argparse
+from concurrent.futures import as_completed
+from database import get_db
+from migrations import run_migrations
+from utils.background import get_process_pool
+from utils.text_index import text_extraction_available, index_file_text
+from utils.blobstore import resolve_path
+
+'''
+Build the full-text index for files uploaded before it existed (or rebuild it).
+
+Usage:
+    python reindex_text.py          # index files that have never been indexed
+    python reindex_text.py --all    # re-extract every file
+    python reindex_text.py --failed # retry files whose extraction failed
+'''
+
+parser = argparse.ArgumentParser(description="Extract PDF text into the full-text index")
+group = parser.add_mutually_exclusive_group()
+group.add_argument("--all", action="store_true", help="re-extract every file")
+group.add_argument("--failed", action="store_true", help="retry files whose extraction failed")
+args = parser.parse_args()
+
+if not text_extraction_available():
+    raise SystemExit("❌ PyMuPDF is not installed (pip install pymupdf)")
+
+run_migrations()
+
+with get_db() as (conn, cursor):
+    if args.all:
+        cursor.execute("SELECT id, upload_path FROM files")
+    elif args.failed:
+        cursor.execute("""
+            SELECT f.id, f.upload_path FROM files f
+            JOIN file_text_state s ON s.file_id = f.id
+            WHERE s.status = 'failed'
+        """)
+    else:
+        cursor.execute("""
+            SELECT f.id, f.upload_path FROM files f
+            WHERE NOT EXISTS (SELECT 1 FROM file_text_state s WHERE s.file_id = f.id)
+        """)
+    files = cursor.fetchall()
+
+pool = get_process_pool()
+futures = {pool.submit(index_file_text, f["id"], resolve_path(f["upload_path"])): f["id"] for f in files}
+
+failed = 0
+for future in as_completed(futures):
+    if future.exception():
+        failed += 1
+        print(f"⚠️  {futures[future]}: {future.exception()}")
+
+print(f"✅ Indexed {len(files) - failed} of {len(files)} files")
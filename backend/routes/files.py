@@ -1,15 +1,394 @@
 import os
-from flask import Blueprint, request
-from werkzeug.utils import secure_filename
-from database import get_db
+from flask import Blueprint, request, send_file, Response
+from database import get_db, chunked
+from utils.folder_paths import get_full_paths
+from utils.blobstore import (
+    UPLOAD_DIR, BlobMissing, hash_stream, save_to_temp, blob_exists, add_blob_ref, release_blob_ref,
+    remove_released_blob, resolve_path
+)
+from utils.thumbnails import (
+    THUMBNAIL_SIZES, DEFAULT_THUMBNAIL_SIZE, thumbnail_path, thumbnail_status,
+    schedule_thumbnails, is_scheduled, remove_thumbnails
+)
+from utils.text_index import schedule_text_extraction, remove_file_text, build_match_query
+from utils.tag_bitmaps import find_files_with_tags, count_tags_with, record_files_changed
 from utils.idgen import generate_uuid
-from utils.response import success, error
+from utils.response import success, error, wants_ndjson, ndjson_stream
+from config import settings
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import json
+import base64
 
 files_bp = Blueprint("files", __name__)
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 500
+MAX_STREAM_PAGE_SIZE = 100_000  # NDJSON pages are sent as they are read, so they may be much larger
+STREAM_BATCH_SIZE = 200         # Rows read and hydrated at a time
+# Tags and folders with more files are paged by walking files newest first (see is_dense_filter)
+DENSE_SET_FILES = 2000
+
+# How GET /api/files/<id>/content hands out bytes:
+#   "direct"     - stream from this process (zero-copy sendfile when the WSGI server supports it)
+#   "x-accel"    - nginx: respond with X-Accel-Redirect to X_ACCEL_PREFIX + path inside UPLOAD_DIR
+#   "x-sendfile" - Apache/lighttpd: respond with X-Sendfile and the absolute path
+FILE_SERVE_MODE = settings["FILE_SERVE_MODE"]
+X_ACCEL_PREFIX = settings["X_ACCEL_PREFIX"]
+CONTENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+MAX_BATCH_FILES = 500
+BATCH_WRITE_WORKERS = 4
+
+def encode_cursor(uploaded_at, file_id):
+    """Encode the sort key of the last file on a page as an opaque cursor string."""
+    raw = json.dumps([uploaded_at, file_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor_str):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (uploaded_at, file_id)
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        uploaded_at, file_id = json.loads(base64.urlsafe_b64decode(cursor_str.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(uploaded_at, str) or not isinstance(file_id, str):
+        raise ValueError("Invalid cursor")
+    return uploaded_at, file_id
+
+def insert_file_record(cursor, file_id, name, save_path, size, uploaded_at, tag_ids, folder_ids, sha256=None):
+    """
+    Insert a stored file into the files table together with its tag and folder bindings.
+
+    Raises:
+        ValueError: If a tag or folder ID does not exist (the caller's transaction is rolled back).
+    """
+    # Insert into files table
+    cursor.execute("""
+        INSERT INTO files (id, name, upload_path, size, uploaded_at, sha256)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (file_id, name, save_path, size, uploaded_at, sha256))
+
+    # Insert into file_tags
+    for tag_id in tag_ids:
+        cursor.execute("SELECT id FROM tags WHERE id = ?", (tag_id,))
+        if not cursor.fetchone():
+            raise ValueError(f"Tag ID not found: {tag_id}")
+        cursor.execute("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (file_id, tag_id))
+
+    # Insert into file_folders
+    for folder_id in folder_ids:
+        cursor.execute("SELECT id FROM folders WHERE id = ?", (folder_id,))
+        if not cursor.fetchone():
+            raise ValueError(f"Folder ID not found: {folder_id}")
+        cursor.execute("INSERT INTO file_folders (file_id, folder_id) VALUES (?, ?)", (file_id, folder_id))
+
+def schedule_background_work(file_id, path):
+    """Queue thumbnail rendering and text extraction for a newly stored file (after commit), given its stored path."""
+    schedule_thumbnails(file_id, resolve_path(path))
+    schedule_text_extraction(file_id, resolve_path(path))
+
+def is_id_list(value):
+    """True for a JSON array of ids: strings or integers (not booleans, objects or nested arrays)."""
+    return isinstance(value, list) and all(
+        isinstance(item, (str, int)) and not isinstance(item, bool) for item in value
+    )
+
+def find_missing_ids(cursor, table, ids):
+    """
+    Check which of the given IDs do not exist in a table, with one query per batch of IDs.
+
+    Args:
+        cursor: Database cursor.
+        table (str): "tags" or "folders".
+        ids (iterable): IDs to check (tag IDs may be ints or numeric strings).
+
+    Returns:
+        list: The IDs that were not found, in the order given.
+    """
+    if table not in ("tags", "folders"):
+        raise ValueError(f"Unsupported table: {table}")
+
+    ids = list(dict.fromkeys(ids))
+    found = set()
+    for batch in chunked(ids):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", batch)
+        found.update(str(row["id"]) for row in cursor.fetchall())
+    return [i for i in ids if str(i) not in found]
+
+def is_dense_filter(cursor, tag_ids, folder_ids, recursive=False):
+    """
+    Tell whether every tag and folder of a filter holds more than DENSE_SET_FILES files.
+
+    A page of such a filter is cheapest to find by walking files newest first
+    and stopping once it is full (build_file_filter(walk_by_date=True)): matches
+    are common, and loading one large folder only to sort it costs more on
+    every page. A small tag or folder is better loaded whole. Each check is a
+    count on the tag or folder index that stops after DENSE_SET_FILES + 1 rows.
+    """
+    if not tag_ids and not folder_ids:
+        return False
+
+    checks = [("SELECT 1 FROM file_tags WHERE tag_id = ?", tag_id) for tag_id in dict.fromkeys(tag_ids)]
+    for fid in dict.fromkeys(folder_ids):
+        if recursive:
+            checks.append(("""
+                SELECT 1 FROM folder_paths fp
+                JOIN file_folders ff ON ff.folder_id = fp.descendant_id
+                WHERE fp.ancestor_id = ?
+            """, fid))
+        else:
+            checks.append(("SELECT 1 FROM file_folders WHERE folder_id = ?", fid))
+
+    for sql, value in checks:
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT ?)", (value, DENSE_SET_FILES + 1))
+        if cursor.fetchone()[0] <= DENSE_SET_FILES:
+            return False
+    return True
+
+def build_file_filter(tag_ids, folder_ids, where_clauses=None, params=None, recursive=False, walk_by_date=False):
+    """
+    Build the WHERE clause selecting files (aliased f) that carry all tag_ids and sit in all folder_ids.
+
+    Args:
+        tag_ids (list): Tag IDs the files must all have.
+        folder_ids (list): Folder IDs the files must all be in.
+        where_clauses (list, optional): Extra conditions to AND in.
+        params (list, optional): Parameters of the extra conditions.
+        recursive (bool): Also match files in any subfolder of each folder
+            (one join against the folder_paths closure table per folder).
+        walk_by_date (bool): Express every condition as a per-file primary-key
+            probe, so a page ordered by uploaded_at walks idx_files_uploaded_at
+            and stops at LIMIT instead of sorting every match. Only pays off
+            when matches are common (see is_dense_filter); never for COUNT(*).
+
+    Returns:
+        tuple: (where_sql, params); where_sql is empty if there are no conditions.
+    """
+    where_clauses = list(where_clauses or [])
+    params = list(params or [])
+    # A repeated tag would never reach COUNT(DISTINCT tag_id) = len(tag_ids) below
+    tag_ids = list({str(t): t for t in tag_ids}.values())
+
+    if walk_by_date:
+        for tag_id in tag_ids:
+            where_clauses.append("EXISTS (SELECT 1 FROM file_tags ft WHERE ft.file_id = f.id AND ft.tag_id = ?)")
+            params.append(tag_id)
+        for fid in dict.fromkeys(folder_ids):
+            if recursive:
+                where_clauses.append("""
+                    EXISTS (
+                        SELECT 1 FROM file_folders ff
+                        JOIN folder_paths fp ON fp.ancestor_id = ? AND fp.descendant_id = ff.folder_id
+                        WHERE ff.file_id = f.id
+                    )
+                """)
+            else:
+                where_clauses.append("EXISTS (SELECT 1 FROM file_folders ff WHERE ff.file_id = f.id AND ff.folder_id = ?)")
+            params.append(fid)
+        return "WHERE " + " AND ".join(where_clauses), params
+
+    # Tag intersection: files having every requested tag. With a folder filter the
+    # folder's files drive the query and each tag is a primary-key probe on
+    # file_tags; otherwise the tag index is grouped once per file.
+    if tag_ids and folder_ids:
+        for tag_id in tag_ids:
+            where_clauses.append("""
+                EXISTS (
+                    SELECT 1 FROM file_tags ft
+                    WHERE ft.file_id = f.id AND ft.tag_id = ?
+                )
+            """)
+            params.append(tag_id)
+    elif tag_ids:
+        tag_placeholders = ','.join(['?'] * len(tag_ids))
+        where_clauses.append(f"""
+            f.id IN (
+                SELECT file_id FROM file_tags
+                WHERE tag_id IN ({tag_placeholders})
+                GROUP BY file_id
+                HAVING COUNT(DISTINCT tag_id) = ?
+            )
+        """)
+        params.extend(tag_ids)
+        params.append(len(tag_ids))
+
+    for fid in folder_ids:
+        if recursive:
+            where_clauses.append("""
+                f.id IN (
+                    SELECT ff.file_id FROM folder_paths fp
+                    JOIN file_folders ff ON ff.folder_id = fp.descendant_id
+                    WHERE fp.ancestor_id = ?
+                )
+            """)
+        else:
+            where_clauses.append("""
+                f.id IN (
+                    SELECT file_id FROM file_folders
+                    WHERE folder_id = ?
+                )
+            """)
+        params.append(fid)
+
+    if not where_clauses:
+        return "", params
+    return "WHERE " + " AND ".join(where_clauses), params
+
+def fetch_folder_file_ids(cursor, folder_ids, recursive=False):
+    """Return the set of ids of the files that sit in every one of folder_ids (or their subtrees)."""
+    # Plain tuples: a folder can hold most of the library, and sqlite3.Row per id doubles the cost
+    ids_cursor = cursor.connection.cursor()
+    ids_cursor.row_factory = None
+    file_ids = None
+    for fid in dict.fromkeys(folder_ids):
+        if recursive:
+            ids_cursor.execute("""
+                SELECT ff.file_id FROM folder_paths fp
+                JOIN file_folders ff ON ff.folder_id = fp.descendant_id
+                WHERE fp.ancestor_id = ?
+            """, (fid,))
+        else:
+            ids_cursor.execute("SELECT file_id FROM file_folders WHERE folder_id = ?", (fid,))
+        in_folder = {file_id for (file_id,) in ids_cursor.fetchall()}
+        file_ids = in_folder if file_ids is None else file_ids & in_folder
+        if not file_ids:
+            break
+    ids_cursor.close()
+    return file_ids or set()
+
+def fetch_tag_facets(cursor, tag_ids, folder_ids, recursive=False):
+    """
+    Count how many of the files matching a filter carry each other tag, grouped by category.
+
+    Counted from the bitmap index; a folder filter first loads the folders' file
+    ids from the folder index and restricts the count to them. While the index
+    is rebuilt, one aggregate query over file_tags is used instead.
+
+    Returns:
+        dict: category -> list of {"id", "name", "count"}, most files first
+    """
+    if folder_ids:
+        counts = count_tags_with(tag_ids, within=fetch_folder_file_ids(cursor, folder_ids, recursive))
+    else:
+        counts = count_tags_with(tag_ids)
+    if counts is None:
+        where_sql, params = build_file_filter(tag_ids, folder_ids, recursive=recursive)
+        cursor.execute(f"""
+            SELECT ft.tag_id, COUNT(*) AS count
+            FROM files f
+            JOIN file_tags ft ON ft.file_id = f.id
+            {where_sql}
+            GROUP BY ft.tag_id
+        """, params)
+        selected = {str(t) for t in tag_ids}
+        counts = {str(row["tag_id"]): row["count"] for row in cursor.fetchall()
+                  if str(row["tag_id"]) not in selected}
+
+    facets = {}
+    for batch in chunked(counts):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"SELECT id, name, category FROM tags WHERE id IN ({placeholders})", batch)
+        for row in cursor.fetchall():
+            facets.setdefault(row["category"], []).append({
+                "id": row["id"],
+                "name": row["name"],
+                "count": counts[str(row["id"])]
+            })
+
+    for items in facets.values():
+        items.sort(key=lambda item: (-item["count"], item["name"]))
+    return facets
+
+def serialize_files(cursor, files):
+    """
+    Turn files rows into response dicts with their tags and folders (including full paths).
+
+    Uses a constant number of queries regardless of how many files are given.
+    """
+    page_ids = [f["id"] for f in files]
+    tags_by_file = fetch_tags_by_file(cursor, page_ids)
+    folders_by_file = fetch_folders_by_file(cursor, page_ids)
+
+    # Look up full paths of only the folders on this page
+    full_paths = get_full_paths(
+        cursor, {fo["id"] for fos in folders_by_file.values() for fo in fos}
+    )
+
+    result = []
+    for f in files:
+        file_id = f["id"]
+
+        folders = folders_by_file.get(file_id, [])
+        for folder in folders:
+            folder["full_path"] = full_paths.get(folder["id"], [])
+
+        result.append({
+            "id": file_id,
+            "name": f["name"],
+            "size": f["size"],
+            "upload_path": f["upload_path"],
+            "uploaded_at": f["uploaded_at"],
+            "tags": tags_by_file.get(file_id, []),
+            "folders": folders
+        })
+    return result
+
+def fetch_tags_by_file(cursor, file_ids):
+    """
+    Load the tags of many files at once.
+
+    Returns:
+        dict: file_id -> list of {"id", "name", "category"}
+    """
+    tags_by_file = {}
+    for batch in chunked(file_ids):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"""
+            SELECT ft.file_id, t.id, t.name, t.category
+            FROM file_tags ft JOIN tags t ON ft.tag_id = t.id
+            WHERE ft.file_id IN ({placeholders})
+            ORDER BY ft.file_id, ft.tag_id
+        """, batch)
+        for row in cursor.fetchall():
+            tags_by_file.setdefault(row["file_id"], []).append({
+                "id": row["id"],
+                "name": row["name"],
+                "category": row["category"]
+            })
+    return tags_by_file
+
+def fetch_folders_by_file(cursor, file_ids):
+    """
+    Load the folders of many files at once.
+
+    Returns:
+        dict: file_id -> list of {"id", "name", "parent_id"}
+    """
+    folders_by_file = {}
+    for batch in chunked(file_ids):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"""
+            SELECT ff.file_id, fo.id, fo.name, fo.parent_id
+            FROM file_folders ff JOIN folders fo ON ff.folder_id = fo.id
+            WHERE ff.file_id IN ({placeholders})
+            ORDER BY ff.file_id, ff.folder_id
+        """, batch)
+        for row in cursor.fetchall():
+            folders_by_file.setdefault(row["file_id"], []).append({
+                "id": row["id"],
+                "name": row["name"],
+                "parent_id": row["parent_id"]
+            })
+    return folders_by_file
 
 @files_bp.route("/upload", methods=["POST"])
 def upload_file():
@@ -58,59 +437,50 @@ def upload_file():
     except Exception:
         return error("tags and folders must be JSON array strings", 400)
 
-    if not isinstance(tag_ids, list) or not isinstance(folder_ids, list):
-        return error("tags and folders must be arrays", 400)
+    if not is_id_list(tag_ids) or not is_id_list(folder_ids):
+        return error("tags and folders must be arrays of ids", 400)
 
     original_name = file.filename
     file_id = generate_uuid()
+    uploaded_at = datetime.now(timezone.utc).isoformat()
 
-    # Generate file path
-    today = datetime.now(timezone.utc)
-    folder_name = today.strftime("%Y_%m")
-    folder_path = os.path.join(UPLOAD_DIR, folder_name)
-    os.makedirs(folder_path, exist_ok=True)
-    filename = f"{file_id}.pdf"
-    save_path = os.path.join(folder_path, secure_filename(filename))
-
+    # Hash first so content that is already stored is never written to disk again
     try:
-        file.save(save_path)
+        sha256, size = hash_stream(file.stream)
+        file.stream.seek(0)
+        with get_db() as (conn, cursor):
+            duplicate = blob_exists(cursor, sha256)
+        temp_path = None if duplicate else save_to_temp(file.stream)
     except Exception as e:
         return error(f"Failed to save file: {str(e)}", 500)
 
-    uploaded_at = today.isoformat()
-
+    stored_path = None
     try:
         with get_db() as (conn, cursor):
-            # Insert into files table
-            cursor.execute("""
-                INSERT INTO files (id, name, upload_path, size, uploaded_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                file_id,
-                original_name,
-                save_path,
-                os.path.getsize(save_path),
-                uploaded_at
-            ))
-
-            # Insert into file_tags
-            for tag_id in tag_ids:
-                cursor.execute("SELECT id FROM tags WHERE id = ?", (tag_id,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Tag ID not found: {tag_id}")
-                cursor.execute("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (file_id, tag_id))
-
-            # Insert into file_folders
-            for folder_id in folder_ids:
-                cursor.execute("SELECT id FROM folders WHERE id = ?", (folder_id,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Folder ID not found: {folder_id}")
-                cursor.execute("INSERT INTO file_folders (file_id, folder_id) VALUES (?, ?)", (file_id, folder_id))
+            try:
+                save_path, created = add_blob_ref(cursor, sha256, size, temp_path)
+            except BlobMissing:
+                # The last file sharing this content was deleted since blob_exists()
+                file.stream.seek(0)
+                temp_path = save_to_temp(file.stream)
+                save_path, created = add_blob_ref(cursor, sha256, size, temp_path)
+            if created:
+                stored_path = save_path
+            insert_file_record(
+                cursor, file_id, original_name, save_path, size,
+                uploaded_at, tag_ids, folder_ids, sha256=sha256
+            )
 
     except Exception as e:
-        if os.path.exists(save_path):
-            os.remove(save_path)
+        if stored_path and os.path.exists(resolve_path(stored_path)):
+            os.remove(resolve_path(stored_path))
         return error(f"Database write failed: {str(e)}", 500)
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    record_files_changed()
+    schedule_background_work(file_id, save_path)
 
     return success({
         "file_id": file_id,
@@ -142,23 +512,9 @@ def get_file(file_id):
         if not file:
             return error("File not found", 404)
 
-        # Query tag information
-        cursor.execute("""
-            SELECT t.id, t.name, t.category
-            FROM file_tags ft
-            JOIN tags t ON ft.tag_id = t.id
-            WHERE ft.file_id = ?
-        """, (file_id,))
-        tags = [dict(row) for row in cursor.fetchall()]
-
-        # Query folder information
-        cursor.execute("""
-            SELECT f.id, f.name, f.parent_id
-            FROM file_folders ff
-            JOIN folders f ON ff.folder_id = f.id
-            WHERE ff.file_id = ?
-        """, (file_id,))
-        folders = [dict(row) for row in cursor.fetchall()]
+        # Query tag and folder information
+        tags = fetch_tags_by_file(cursor, [file_id]).get(file_id, [])
+        folders = fetch_folders_by_file(cursor, [file_id]).get(file_id, [])
 
         return success({
             "id": file["id"],
@@ -170,6 +526,335 @@ def get_file(file_id):
             "folders": folders
         })
 
+def _hash_upload(file):
+    sha256, size = hash_stream(file.stream)
+    file.stream.seek(0)
+    return sha256, size
+
+@files_bp.route("/upload/batch", methods=["POST"])
+def upload_files_batch():
+    """
+    Upload many files at once in a single transaction.
+    ---
+    tags:
+      - File
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: files
+        in: formData
+        type: file
+        required: true
+        description: The PDF files to upload (repeat the field for each file)
+      - name: tags
+        in: formData
+        type: string
+        required: false
+        description: JSON string of tag_id list applied to every file (optional)
+      - name: folders
+        in: formData
+        type: string
+        required: false
+        description: JSON string of folder_id list applied to every file (optional)
+      - name: per_file
+        in: formData
+        type: string
+        required: false
+        description: 'JSON array aligned with files, each item {"tags": [...], "folders": [...]} added to the shared lists (optional)'
+    responses:
+      201:
+        description: All files uploaded
+      207:
+        description: Some files failed, see each item's status and error
+    """
+    files = request.files.getlist("files")
+    if not files:
+        return error("Missing files", 400)
+    if len(files) > MAX_BATCH_FILES:
+        return error(f"At most {MAX_BATCH_FILES} files per batch", 400)
+
+    try:
+        shared_tags = json.loads(request.form.get("tags") or "[]")
+        shared_folders = json.loads(request.form.get("folders") or "[]")
+        per_file = json.loads(request.form.get("per_file") or "[]")
+    except Exception:
+        return error("tags, folders and per_file must be JSON strings", 400)
+
+    if not is_id_list(shared_tags) or not is_id_list(shared_folders):
+        return error("tags and folders must be arrays of ids", 400)
+    if not isinstance(per_file, list) or len(per_file) > len(files):
+        return error("per_file must be an array with at most one item per file", 400)
+
+    # 1. Resolve each file's tag and folder lists
+    items = []
+    for index, file in enumerate(files):
+        extra = per_file[index] if index < len(per_file) else {}
+        extra_tags = extra.get("tags", []) if isinstance(extra, dict) else None
+        extra_folders = extra.get("folders", []) if isinstance(extra, dict) else None
+        item = {"index": index, "name": file.filename, "file": file, "error": None}
+        if not is_id_list(extra_tags) or not is_id_list(extra_folders):
+            item["error"] = "per_file items must be objects with tags and folders arrays of ids"
+        else:
+            item["tags"] = list({str(t): t for t in shared_tags + extra_tags}.values())
+            item["folders"] = list({str(f): f for f in shared_folders + extra_folders}.values())
+        items.append(item)
+
+    # 2. Validate every referenced tag and folder with one set-based query each
+    all_tags = {str(t): t for item in items if not item["error"] for t in item["tags"]}
+    all_folders = {str(f): f for item in items if not item["error"] for f in item["folders"]}
+    with get_db() as (conn, cursor):
+        missing_tags = {str(t) for t in find_missing_ids(cursor, "tags", all_tags.values())}
+        missing_folders = {str(f) for f in find_missing_ids(cursor, "folders", all_folders.values())}
+
+    for item in items:
+        if item["error"]:
+            continue
+        bad_tags = [t for t in item["tags"] if str(t) in missing_tags]
+        bad_folders = [f for f in item["folders"] if str(f) in missing_folders]
+        if bad_tags:
+            item["error"] = f"Tag ID not found: {bad_tags[0]}"
+        elif bad_folders:
+            item["error"] = f"Folder ID not found: {bad_folders[0]}"
+
+    valid = [item for item in items if not item["error"]]
+
+    # 3. Hash and store contents concurrently; content already stored is not written again
+    temp_paths = []
+    stored_paths = []
+    try:
+        with ThreadPoolExecutor(max_workers=BATCH_WRITE_WORKERS) as pool:
+            for item, (sha256, size) in zip(valid, pool.map(lambda i: _hash_upload(i["file"]), valid)):
+                item["sha256"] = sha256
+                item["size"] = size
+
+            with get_db() as (conn, cursor):
+                existing = set()
+                for batch_shas in chunked({item["sha256"] for item in valid}):
+                    placeholders = ','.join(['?'] * len(batch_shas))
+                    cursor.execute(f"SELECT sha256 FROM blobs WHERE sha256 IN ({placeholders})", batch_shas)
+                    existing.update(row["sha256"] for row in cursor.fetchall())
+
+            to_write = {}
+            for item in valid:
+                if item["sha256"] not in existing and item["sha256"] not in to_write:
+                    to_write[item["sha256"]] = item
+            written = dict(zip(
+                to_write,
+                pool.map(lambda i: save_to_temp(i["file"].stream), to_write.values())
+            ))
+            temp_paths = list(written.values())
+    except Exception as e:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return error(f"Failed to save files: {str(e)}", 500)
+
+    # 4. Insert all rows in one transaction
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    for item in valid:
+        item["file_id"] = generate_uuid()
+
+    try:
+        with get_db() as (conn, cursor):
+            for item in valid:
+                try:
+                    item["path"], created = add_blob_ref(
+                        cursor, item["sha256"], item["size"], written.get(item["sha256"])
+                    )
+                except BlobMissing:
+                    # The last file sharing this content was deleted since the lookup above
+                    item["file"].stream.seek(0)
+                    written[item["sha256"]] = save_to_temp(item["file"].stream)
+                    temp_paths.append(written[item["sha256"]])
+                    item["path"], created = add_blob_ref(
+                        cursor, item["sha256"], item["size"], written[item["sha256"]]
+                    )
+                if created:
+                    stored_paths.append(item["path"])
+
+            cursor.executemany("""
+                INSERT INTO files (id, name, upload_path, size, uploaded_at, sha256)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (item["file_id"], item["name"], item["path"], item["size"], uploaded_at, item["sha256"])
+                for item in valid
+            ])
+            cursor.executemany(
+                "INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)",
+                [(item["file_id"], tag_id) for item in valid for tag_id in item["tags"]]
+            )
+            cursor.executemany(
+                "INSERT INTO file_folders (file_id, folder_id) VALUES (?, ?)",
+                [(item["file_id"], folder_id) for item in valid for folder_id in item["folders"]]
+            )
+    except Exception as e:
+        for path in map(resolve_path, stored_paths):
+            if os.path.exists(path):
+                os.remove(path)
+        return error(f"Database write failed: {str(e)}", 500)
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    record_files_changed()
+    for item in valid:
+        schedule_background_work(item["file_id"], item["path"])
+
+    results = []
+    for item in items:
+        if item["error"]:
+            results.append({"index": item["index"], "name": item["name"], "status": "error", "error": item["error"]})
+        else:
+            results.append({
+                "index": item["index"],
+                "name": item["name"],
+                "status": "success",
+                "file_id": item["file_id"],
+                "uploaded_at": uploaded_at
+            })
+
+    return success({
+        "uploaded": len(valid),
+        "failed": len(items) - len(valid),
+        "files": results
+    }, code=201 if len(valid) == len(items) else 207)
+
+@files_bp.route("/<file_id>/content", methods=["GET"])
+def get_file_content(file_id):
+    """
+    Download a file's bytes (supports Range requests and conditional GET).
+    ---
+    tags:
+      - File
+    produces:
+      - application/pdf
+    parameters:
+      - name: file_id
+        in: path
+        type: string
+        required: true
+        description: File ID
+      - name: Range
+        in: header
+        type: string
+        required: false
+        description: Byte range, e.g. bytes=0-65535
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag from a previous response (the content SHA-256)
+    responses:
+      200:
+        description: Full file content
+      206:
+        description: Requested byte range
+      304:
+        description: Not modified
+    """
+    with get_db() as (conn, cursor):
+        cursor.execute("SELECT name, upload_path, sha256, uploaded_at FROM files WHERE id = ?", (file_id,))
+        file = cursor.fetchone()
+        if not file:
+            return error("File not found", 404)
+
+    path = resolve_path(file["upload_path"])
+    if not os.path.isfile(path):
+        return error("File content is missing on the server", 410)
+
+    # Content never changes for a given file id, so its hash is a strong validator
+    etag = file["sha256"]
+    try:
+        last_modified = datetime.fromisoformat(file["uploaded_at"])
+    except (TypeError, ValueError):
+        last_modified = None
+
+    if FILE_SERVE_MODE in ("x-accel", "x-sendfile"):
+        # Let the front proxy send the bytes (it also handles Range)
+        response = Response(mimetype="application/pdf")
+        if FILE_SERVE_MODE == "x-accel":
+            relative = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+            response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX.rstrip("/") + "/" + relative
+        else:
+            response.headers["X-Sendfile"] = path
+        if etag:
+            response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.make_conditional(request)
+    else:
+        response = send_file(
+            path,
+            mimetype="application/pdf",
+            download_name=file["name"],
+            conditional=True,
+            etag=etag or True,
+            last_modified=last_modified
+        )
+
+    response.headers["Cache-Control"] = CONTENT_CACHE_CONTROL
+    return response
+
+@files_bp.route("/<file_id>/thumbnail", methods=["GET"])
+def get_thumbnail(file_id):
+    """
+    Get the first-page thumbnail of a file (PNG), rendered in the background after upload.
+    ---
+    tags:
+      - File
+    produces:
+      - image/png
+    parameters:
+      - name: file_id
+        in: path
+        type: string
+        required: true
+        description: File ID
+      - name: size
+        in: query
+        type: string
+        required: false
+        default: medium
+        enum: [small, medium, large]
+        description: Thumbnail size (128, 256 or 512 px wide)
+    responses:
+      200:
+        description: PNG image
+      202:
+        description: Thumbnail is still being rendered (status pending), try again later
+      501:
+        description: No PDF renderer is installed on the server
+    """
+    size = request.args.get("size", DEFAULT_THUMBNAIL_SIZE)
+    if size not in THUMBNAIL_SIZES:
+        return error(f"size must be one of {', '.join(THUMBNAIL_SIZES)}", 400)
+
+    status = thumbnail_status(file_id, size)
+    if status == "ready":
+        # The thumbnail of a file id never changes, so clients may cache it forever
+        response = send_file(thumbnail_path(file_id, size), mimetype="image/png", conditional=True)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+    if status == "failed":
+        return error("Thumbnail could not be rendered", 422)
+
+    if status == "unavailable":
+        return error("Thumbnail rendering is not available on this server", 501)
+
+    with get_db() as (conn, cursor):
+        cursor.execute("SELECT upload_path FROM files WHERE id = ?", (file_id,))
+        file = cursor.fetchone()
+        if not file:
+            return error("File not found", 404)
+
+    # Files uploaded before thumbnails existed are rendered on demand
+    if not is_scheduled(file_id):
+        schedule_thumbnails(file_id, resolve_path(file["upload_path"]))
+
+    return success({"file_id": file_id, "size": size, "status": "pending"}, 202)
+
 @files_bp.route("/<file_id>", methods=["PUT"])
 def update_file_relations(file_id):
     """
@@ -205,8 +890,8 @@ def update_file_relations(file_id):
     if tags is None or folders is None:
         return error("Both tags and folders must be provided (can be empty arrays)", 400)
 
-    if not isinstance(tags, list) or not isinstance(folders, list):
-        return error("tags and folders must be arrays", 400)
+    if not is_id_list(tags) or not is_id_list(folders):
+        return error("tags and folders must be arrays of ids", 400)
 
     with get_db() as (conn, cursor):
         # Check if file exists
@@ -214,26 +899,278 @@ def update_file_relations(file_id):
         if not cursor.fetchone():
             return error("File not found", 404)
 
-        # Clear old bindings
-        cursor.execute("DELETE FROM file_tags WHERE file_id = ?", (file_id,))
-        cursor.execute("DELETE FROM file_folders WHERE file_id = ?", (file_id,))
+        # Validate every requested id before writing anything
+        missing = find_missing_ids(cursor, "tags", tags)
+        if missing:
+            return error(f"Tag not found: {missing[0]}", 400)
+        missing = find_missing_ids(cursor, "folders", folders)
+        if missing:
+            return error(f"Folder not found: {missing[0]}", 400)
+
+        # Compare with the current bindings and only write the difference
+        cursor.execute("SELECT tag_id FROM file_tags WHERE file_id = ?", (file_id,))
+        current_tags = {str(row["tag_id"]): row["tag_id"] for row in cursor.fetchall()}
+        cursor.execute("SELECT folder_id FROM file_folders WHERE file_id = ?", (file_id,))
+        current_folders = {str(row["folder_id"]): row["folder_id"] for row in cursor.fetchall()}
+
+        wanted_tags = {str(t): t for t in tags}
+        wanted_folders = {str(f): f for f in folders}
 
-        # Insert new tags
-        for tag_id in tags:
-            cursor.execute("SELECT id FROM tags WHERE id = ?", (tag_id,))
-            if not cursor.fetchone():
-                return error(f"Tag not found: {tag_id}", 400)
-            cursor.execute("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (file_id, tag_id))
+        tags_removed = [tag_id for key, tag_id in current_tags.items() if key not in wanted_tags]
+        tags_added = [tag_id for key, tag_id in wanted_tags.items() if key not in current_tags]
 
-        # Insert new folders
-        for folder_id in folders:
-            cursor.execute("SELECT id FROM folders WHERE id = ?", (folder_id,))
-            if not cursor.fetchone():
-                return error(f"Folder not found: {folder_id}", 400)
-            cursor.execute("INSERT INTO file_folders (file_id, folder_id) VALUES (?, ?)", (file_id, folder_id))
+        cursor.executemany(
+            "DELETE FROM file_tags WHERE file_id = ? AND tag_id = ?",
+            [(file_id, tag_id) for tag_id in tags_removed]
+        )
+        cursor.executemany(
+            "INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)",
+            [(file_id, tag_id) for tag_id in tags_added]
+        )
+        cursor.executemany(
+            "DELETE FROM file_folders WHERE file_id = ? AND folder_id = ?",
+            [(file_id, folder_id) for key, folder_id in current_folders.items() if key not in wanted_folders]
+        )
+        cursor.executemany(
+            "INSERT INTO file_folders (file_id, folder_id) VALUES (?, ?)",
+            [(file_id, folder_id) for key, folder_id in wanted_folders.items() if key not in current_folders]
+        )
+
+    if tags_added or tags_removed:
+        record_files_changed()
 
     return success({"file_id": file_id}, 200)
 
+@files_bp.route("/bulk/relations", methods=["POST"])
+def bulk_update_relations():
+    """
+    Add or remove tags and folders across many files at once (one transaction).
+    ---
+    tags:
+      - File
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            file_ids:
+              type: array
+              items: { type: string }
+              description: Target files (use either file_ids or filter)
+            filter:
+              type: object
+              description: Target every file matching a list_files-style filter
+              properties:
+                tag_ids:
+                  type: array
+                  items: { type: integer }
+                folder_ids:
+                  type: array
+                  items: { type: string }
+                recursive:
+                  type: boolean
+                  description: Also match files in subfolders of folder_ids
+            add_tags:
+              type: array
+              items: { type: integer }
+            remove_tags:
+              type: array
+              items: { type: integer }
+            add_folders:
+              type: array
+              items: { type: string }
+            remove_folders:
+              type: array
+              items: { type: string }
+    responses:
+      200:
+        description: Update successful, returns affected row counts
+    """
+    data = request.get_json() or {}
+    file_ids = data.get("file_ids")
+    file_filter = data.get("filter")
+    changes = {key: data.get(key, []) for key in ("add_tags", "remove_tags", "add_folders", "remove_folders")}
+
+    if (file_ids is None) == (file_filter is None):
+        return error("Provide exactly one of file_ids or filter", 400)
+
+    if file_ids is not None:
+        if not isinstance(file_ids, list) or not all(isinstance(fid, str) for fid in file_ids):
+            return error("file_ids must be an array of strings", 400)
+
+    if file_filter is not None:
+        if not isinstance(file_filter, dict):
+            return error("filter must be an object", 400)
+        filter_tags = file_filter.get("tag_ids", [])
+        filter_folders = file_filter.get("folder_ids", [])
+        recursive = file_filter.get("recursive", False)
+        if not is_id_list(filter_tags) or not is_id_list(filter_folders):
+            return error("filter.tag_ids and filter.folder_ids must be arrays of ids", 400)
+        if not filter_tags and not filter_folders:
+            return error("filter must contain at least one of tag_ids or folder_ids", 400)
+        if not isinstance(recursive, bool):
+            return error("filter.recursive must be true or false", 400)
+
+    if not all(is_id_list(ids) for ids in changes.values()):
+        return error("add_tags, remove_tags, add_folders and remove_folders must be arrays of ids", 400)
+
+    with get_db() as (conn, cursor):
+        # 1. Validate the ids being added before any write
+        missing = find_missing_ids(cursor, "tags", changes["add_tags"])
+        if missing:
+            return error(f"Tag not found: {missing[0]}", 400)
+        missing = find_missing_ids(cursor, "folders", changes["add_folders"])
+        if missing:
+            return error(f"Folder not found: {missing[0]}", 400)
+
+        # 2. Collect the target files into a temp table so every statement below is set-based
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_targets (file_id TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM bulk_targets")
+        if file_ids is not None:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO bulk_targets (file_id) SELECT id FROM files WHERE id = ?",
+                [(fid,) for fid in file_ids]
+            )
+        else:
+            where_sql, params = build_file_filter(
+                filter_tags, filter_folders, recursive=recursive
+            )
+            cursor.execute(f"INSERT INTO bulk_targets (file_id) SELECT f.id FROM files f {where_sql}", params)
+
+        cursor.execute("SELECT COUNT(*) FROM bulk_targets")
+        matched = cursor.fetchone()[0]
+
+        # 3. Apply the changes
+        cursor.executemany("""
+            INSERT OR IGNORE INTO file_tags (file_id, tag_id)
+            SELECT file_id, ? FROM bulk_targets
+        """, [(tag_id,) for tag_id in changes["add_tags"]])
+        tags_added = max(cursor.rowcount, 0)
+
+        cursor.executemany("""
+            DELETE FROM file_tags
+            WHERE tag_id = ? AND file_id IN (SELECT file_id FROM bulk_targets)
+        """, [(tag_id,) for tag_id in changes["remove_tags"]])
+        tags_removed = max(cursor.rowcount, 0)
+
+        cursor.executemany("""
+            INSERT OR IGNORE INTO file_folders (file_id, folder_id)
+            SELECT file_id, ? FROM bulk_targets
+        """, [(folder_id,) for folder_id in changes["add_folders"]])
+        folders_added = max(cursor.rowcount, 0)
+
+        cursor.executemany("""
+            DELETE FROM file_folders
+            WHERE folder_id = ? AND file_id IN (SELECT file_id FROM bulk_targets)
+        """, [(folder_id,) for folder_id in changes["remove_folders"]])
+        folders_removed = max(cursor.rowcount, 0)
+
+        cursor.execute("DELETE FROM bulk_targets")
+
+    if tags_added or tags_removed:
+        record_files_changed()
+
+    return success({
+        "matched_files": matched,
+        "tags_added": tags_added,
+        "tags_removed": tags_removed,
+        "folders_added": folders_added,
+        "folders_removed": folders_removed
+    }, 200)
+
+@files_bp.route("/search", methods=["GET"])
+def search_file_text():
+    """
+    Full-text search over PDF contents, ranked by relevance (optionally within tag/folder filters).
+    ---
+    tags:
+      - File
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Text to find (matched as a phrase, at least 3 characters)
+      - name: tag_ids
+        in: query
+        type: string
+        required: false
+        description: Multiple tag_ids separated by commas (intersection filter)
+      - name: folder_ids
+        in: query
+        type: string
+        required: false
+        description: Multiple folder IDs separated by commas (intersection filter)
+      - name: recursive
+        in: query
+        type: boolean
+        required: false
+        default: false
+        description: Also match files in any subfolder of the given folders
+      - name: page
+        in: query
+        type: integer
+        required: false
+        default: 1
+      - name: size
+        in: query
+        type: integer
+        required: false
+        default: 20
+    responses:
+      200:
+        description: Matching files, best match first, each with a text snippet
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return error("A search keyword must be provided", 400)
+
+    tag_ids_str = request.args.get("tag_ids")
+    tag_ids = list(dict.fromkeys(tag_ids_str.split(","))) if tag_ids_str else []
+    folder_ids_str = request.args.get("folder_ids")
+    folder_ids = folder_ids_str.split(",") if folder_ids_str else []
+    recursive = request.args.get("recursive", "false").lower() in ("true", "1")
+
+    try:
+        page = int(request.args.get("page", 1))
+        size = int(request.args.get("size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return error("page and size must be integers", 400)
+
+    if page < 1 or size < 1:
+        return error("page and size must be positive", 400)
+    size = min(size, MAX_PAGE_SIZE)
+
+    where_sql, params = build_file_filter(
+        tag_ids, folder_ids, ["file_text MATCH ?"], [build_match_query(q)], recursive=recursive
+    )
+
+    with get_db() as (conn, cursor):
+        cursor.execute(f"""
+            SELECT f.*, snippet(file_text, 0, '[', ']', '...', 16) AS snippet
+            FROM file_text
+            JOIN file_text_state s ON s.id = file_text.rowid
+            JOIN files f ON f.id = s.file_id
+            {where_sql}
+            ORDER BY bm25(file_text)
+            LIMIT ? OFFSET ?
+        """, params + [size + 1, (page - 1) * size])
+        files = cursor.fetchall()
+
+        has_more = len(files) > size
+        files = files[:size]
+
+        result = serialize_files(cursor, files)
+        for item, row in zip(result, files):
+            item["snippet"] = row["snippet"]
+
+    return success({
+        "files": result,
+        "has_more": has_more
+    })
+
 @files_bp.route("", methods=["GET"])
 def list_files():
     """
@@ -252,140 +1189,194 @@ def list_files():
         type: string
         required: false
         description: Multiple folder IDs separated by commas (intersection filter)
+      - name: recursive
+        in: query
+        type: boolean
+        required: false
+        default: false
+        description: Also match files in any subfolder of the given folders
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Opaque next_cursor returned by the previous page (takes precedence over page)
       - name: page
         in: query
         type: integer
         required: false
         default: 1
-        description: Page number, starting from 1
+        description: Page number, starting from 1 (offset pagination, prefer cursor for deep pages)
       - name: size
         in: query
         type: integer
         required: false
         default: 20
-        description: Number of items per page
+        description: Number of items per page (at most 500, or 100000 when streaming NDJSON)
+      - name: with_total
+        in: query
+        type: boolean
+        required: false
+        default: true
+        description: Set to false to skip counting all matches (total is then null)
+      - name: facets
+        in: query
+        type: string
+        required: false
+        enum: [category]
+        description: Also return, per category, how many matching files carry each other tag
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
-        description: Successfully returned paginated file list
+        description: >
+          Successfully returned paginated file list (next_cursor is null on the last page).
+          With Accept application/x-ndjson the files are streamed one per line, followed by
+          a last line holding total, next_cursor and facets.
     """
     folder_ids_str = request.args.get("folder_ids")
     folder_ids = folder_ids_str.split(",") if folder_ids_str else []
+    recursive = request.args.get("recursive", "false").lower() in ("true", "1")
 
     tag_ids_str = request.args.get("tag_ids")
-    page = int(request.args.get("page", 1))
-    size = int(request.args.get("size", 2000000))
-    offset = (page - 1) * size
-
-    tag_ids = tag_ids_str.split(",") if tag_ids_str else []
+    tag_ids = list(dict.fromkeys(tag_ids_str.split(","))) if tag_ids_str else []
 
     if not folder_ids and not tag_ids:
         return error("Must provide at least one of tag_ids or folder_ids", 400)
 
-    with get_db() as (conn, cursor):
-        # 1. Tag_ids subquery
-        file_ids = None
-        if tag_ids:
-            tag_placeholders = ','.join(['?'] * len(tag_ids))
-            tag_sql = f"""
-                SELECT file_id FROM file_tags
-                WHERE tag_id IN ({tag_placeholders})
-                GROUP BY file_id
-                HAVING COUNT(DISTINCT tag_id) = ?
-            """
-            cursor.execute(tag_sql, tag_ids + [len(tag_ids)])
-            file_ids = [row["file_id"] for row in cursor.fetchall()]
-            if not file_ids:
-                return success({"total": 0, "files": []})
+    try:
+        page = int(request.args.get("page", 1))
+        size = int(request.args.get("size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return error("page and size must be integers", 400)
 
-        # 2. Build main query
-        where_clauses = []
-        params = []
+    if page < 1 or size < 1:
+        return error("page and size must be positive", 400)
+    stream = wants_ndjson()
+    size = min(size, MAX_STREAM_PAGE_SIZE if stream else MAX_PAGE_SIZE)
+    offset = (page - 1) * size
 
-        if file_ids is not None:
-            placeholders = ','.join(['?'] * len(file_ids))
-            where_clauses.append(f"f.id IN ({placeholders})")
-            params.extend(file_ids)
+    after = None
+    cursor_str = request.args.get("cursor")
+    if cursor_str:
+        try:
+            after = decode_cursor(cursor_str)
+        except ValueError as e:
+            return error(str(e), 400)
+        offset = 0
 
-        if folder_ids:
-            for fid in folder_ids:
-                where_clauses.append("""
-                    EXISTS (
-                        SELECT 1 FROM file_folders ff
-                        WHERE ff.file_id = f.id AND ff.folder_id = ?
-                    )
-                """)
-                params.append(fid)
+    with_total = request.args.get("with_total", "true").lower() not in ("false", "0")
 
-        where_sql = "WHERE " + " AND ".join(where_clauses)
+    facets = request.args.get("facets")
+    if facets not in (None, "category"):
+        return error("facets must be category", 400)
 
-        # 3. Query file records
-        cursor.execute(f"""
+    # Tag-only filters are answered from the in-memory bitmap index (see utils/tag_bitmaps.py),
+    # unless it is being rebuilt
+    bitmap_page = find_files_with_tags(tag_ids, size + 1, offset, after) if tag_ids and not folder_ids else None
+    use_bitmaps = bitmap_page is not None
+    if use_bitmaps:
+        bitmap_total, page_ids = bitmap_page
+    else:
+        where_sql, params = build_file_filter(tag_ids, folder_ids, recursive=recursive)
+
+    def page_batches(conn):
+        """Yield the page's file rows (plus one to detect a next page) in batches, in page order."""
+        if use_bitmaps:
+            # Load the rows of the ids picked by the index, keeping the index's order
+            batch_cursor = conn.cursor()
+            for batch in chunked(page_ids, STREAM_BATCH_SIZE):
+                placeholders = ','.join(['?'] * len(batch))
+                batch_cursor.execute(f"SELECT * FROM files WHERE id IN ({placeholders})", batch)
+                rows_by_id = {row["id"]: row for row in batch_cursor.fetchall()}
+                yield [rows_by_id[fid] for fid in batch if fid in rows_by_id]
+            batch_cursor.close()
+            return
+
+        # A cursor of its own, so hydration queries can run between batches
+        rows_cursor = conn.cursor()
+
+        # Large tags and folders only: walk files newest first instead of sorting all matches
+        page_where_sql, page_params = where_sql, list(params)
+        if is_dense_filter(rows_cursor, tag_ids, folder_ids, recursive):
+            page_where_sql, page_params = build_file_filter(
+                tag_ids, folder_ids, recursive=recursive, walk_by_date=True
+            )
+
+        # Keyset on (uploaded_at, id) when a cursor is given
+        if after:
+            page_where_sql += " AND (f.uploaded_at, f.id) < (?, ?)"
+            page_params.extend(after)
+
+        rows_cursor.execute(f"""
             SELECT * FROM files f
-            {where_sql}
-            ORDER BY f.uploaded_at DESC
+            {page_where_sql}
+            ORDER BY f.uploaded_at DESC, f.id DESC
             LIMIT ? OFFSET ?
-        """, params + [size, offset])
-        files = cursor.fetchall()
+        """, page_params + [size + 1, offset])
+        while True:
+            batch = rows_cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not batch:
+                break
+            yield batch
+        rows_cursor.close()
 
-        # 4. Query total count
+    def count_total(cursor):
+        if not with_total:
+            return None
+        if use_bitmaps:
+            return bitmap_total
         cursor.execute(f"""
             SELECT COUNT(*) FROM files f
             {where_sql}
         """, params)
-        total = cursor.fetchone()[0]
-
-        # 5. Load all folders to build full path
-        cursor.execute("SELECT id, name, parent_id FROM folders")
-        folder_dict = {f["id"]: dict(f) for f in cursor.fetchall()}
-
-        def build_full_path(folder_id):
-            path = []
-            while folder_id and folder_id in folder_dict:
-                folder = folder_dict[folder_id]
-                path.insert(0, folder["name"])
-                folder_id = folder["parent_id"]
-            return path
-
-        result = []
-        for f in files:
-            file_id = f["id"]
-
-            # Query tags
-            cursor.execute("""
-                SELECT t.id, t.name, t.category
-                FROM file_tags ft JOIN tags t ON ft.tag_id = t.id
-                WHERE ft.file_id = ?
-            """, (file_id,))
-            tags = [dict(row) for row in cursor.fetchall()]
-
-            # Query folders and build full paths
-            cursor.execute("""
-                SELECT fo.id, fo.name, fo.parent_id
-                FROM file_folders ff JOIN folders fo ON ff.folder_id = fo.id
-                WHERE ff.file_id = ?
-            """, (file_id,))
-            raw_folders = cursor.fetchall()
-
-            folders = []
-            for row in raw_folders:
-                folder = dict(row)
-                folder["full_path"] = build_full_path(folder["id"])
-                folders.append(folder)
-
-            result.append({
-                "id": file_id,
-                "name": f["name"],
-                "size": f["size"],
-                "upload_path": f["upload_path"],
-                "uploaded_at": f["uploaded_at"],
-                "tags": tags,
-                "folders": folders
-            })
+        return cursor.fetchone()[0]
 
-    return success({
-        "total": total,
-        "files": result
-    })
+    def summary(cursor, last_file, has_more):
+        data = {
+            "total": count_total(cursor),
+            "next_cursor": encode_cursor(last_file["uploaded_at"], last_file["id"]) if has_more else None
+        }
+        if facets:
+            data["facets"] = fetch_tag_facets(cursor, tag_ids, folder_ids, recursive)
+        return data
+
+    if stream:
+        def generate():
+            # One file per line as each batch is hydrated, then a line with total/next_cursor
+            with get_db() as (conn, cursor):
+                sent = 0
+                last_file = None
+                has_more = False
+                for batch in page_batches(conn):
+                    if sent + len(batch) > size:
+                        has_more = True
+                        batch = batch[:size - sent]
+                    for item in serialize_files(cursor, batch):
+                        yield item
+                    sent += len(batch)
+                    if batch:
+                        last_file = batch[-1]
+                    if has_more:
+                        break
+                yield summary(cursor, last_file, has_more)
+
+        return ndjson_stream(generate())
+
+    with get_db() as (conn, cursor):
+        # 1-3. Query file records
+        files = [row for batch in page_batches(conn) for row in batch]
+        has_more = len(files) > size
+        files = files[:size]
+
+        # 4. Hydrate tags, folders and full paths for the whole page
+        result = serialize_files(cursor, files)
+
+        # 5-6. Total count and facets (optional)
+        data = {"files": result}
+        data.update(summary(cursor, files[-1] if files else None, has_more))
+
+    return success(data)
 
 @files_bp.route("/<file_id>", methods=["DELETE"])
 def delete_file(file_id):
@@ -411,20 +1402,31 @@ def delete_file(file_id):
         if not file:
             return error("File not found", 404)
 
-        upload_path = file["upload_path"]
-
-        # 2. Delete local file
-        if upload_path and os.path.exists(upload_path):
-            try:
-                os.remove(upload_path)
-            except Exception as e:
-                return error(f"Failed to delete local file: {str(e)}", 500)
-
-        # 3. Delete all bindings from intermediate tables
+        # 2. Delete all bindings from intermediate tables
         cursor.execute("DELETE FROM file_tags WHERE file_id = ?", (file_id,))
         cursor.execute("DELETE FROM file_folders WHERE file_id = ?", (file_id,))
 
-        # 4. Delete main file record
+        # 3. Delete the full-text entry and the main file record
+        remove_file_text(cursor, file_id)
         cursor.execute("DELETE FROM files WHERE id = ?", (file_id,))
 
+        # 4. Release the stored content (only unlinked when no other file shares it)
+        if file["sha256"]:
+            unlink_path = release_blob_ref(cursor, file["sha256"])
+        else:
+            unlink_path = resolve_path(file["upload_path"])
+
+    # 5. Delete local file and cached thumbnails after the records are gone
+    record_files_changed()
+    remove_thumbnails(file_id)
+    if unlink_path:
+        try:
+            if file["sha256"]:
+                # Skipped if an upload has stored the same content again since the commit
+                remove_released_blob(file["sha256"], unlink_path)
+            elif os.path.exists(unlink_path):
+                os.remove(unlink_path)
+        except Exception as e:
+            return error(f"Failed to delete local file: {str(e)}", 500)
+
     return success({"deleted_file_id": file_id}, 200)
@@ -2,6 +2,9 @@ from flask import Blueprint, request
 from database import get_db
 from utils.idgen import generate_uuid
 from utils.response import success, error
+from utils.folder_paths import add_folder_path, get_full_paths
+from utils.versions import bump_version
+from utils.http_cache import versioned_response
 
 folders_bp = Blueprint("folders", __name__)
 
@@ -14,8 +17,15 @@ def get_folder_tree():
       - Folder
     responses:
       200:
-        description: Folder tree structure
+        description: Folder tree structure, with an ETag for conditional requests
+      304:
+        description: Not modified since the ETag given in If-None-Match
     """
+    # Served from memory (or as a 304) until a folder is created or deleted
+    return versioned_response(("folders",), build_folder_tree, cache_key="folder_tree")
+
+def build_folder_tree():
+    """Load all folders and nest them under their parents."""
     with get_db() as (conn, cursor):
         cursor.execute("SELECT * FROM folders")
         folders = cursor.fetchall()
@@ -32,7 +42,7 @@ def get_folder_tree():
         else:
             root.append(folder)
 
-    return success(root)
+    return root
 
 @folders_bp.route("", methods=["POST"])
 def create_folder():
@@ -88,6 +98,9 @@ def create_folder():
 
         # Insert the new folder
         cursor.execute("INSERT INTO folders (id, name, parent_id) VALUES (?, ?, ?)", (folder_id, name_clean, parent_id))
+        add_folder_path(cursor, folder_id, parent_id)
+
+    bump_version("folders")
 
     return success({
         "id": folder_id,
@@ -95,14 +108,57 @@ def create_folder():
         "parent_id": parent_id
     }, code=201)
 
+def fetch_subtree(cursor, folder_id):
+    """
+    Find a folder and all its descendants with a single recursive query.
+
+    Returns:
+        list: Rows (id, name, parent_id, depth) ordered by depth, the folder itself first (depth 0).
+    """
+    cursor.execute("""
+        WITH RECURSIVE subtree(id, name, parent_id, depth) AS (
+            SELECT id, name, parent_id, 0 FROM folders WHERE id = ?
+            UNION ALL
+            SELECT f.id, f.name, f.parent_id, s.depth + 1
+            FROM folders f
+            JOIN subtree s ON f.parent_id = s.id
+        )
+        SELECT id, name, parent_id, depth FROM subtree
+        ORDER BY depth, name
+    """, (folder_id,))
+    return cursor.fetchall()
+
 def get_all_descendant_folder_ids(folder_id, cursor):
-    """Recursively find all descendant folder IDs (including itself)."""
-    ids = [folder_id]
-    cursor.execute("SELECT id FROM folders WHERE parent_id = ?", (folder_id,))
-    children = cursor.fetchall()
-    for child in children:
-        ids.extend(get_all_descendant_folder_ids(child["id"], cursor))
-    return ids
+    """Find all descendant folder IDs (including itself), parents before children."""
+    return [row["id"] for row in fetch_subtree(cursor, folder_id)]
+
+@folders_bp.route("/<folder_id>/descendants", methods=["GET"])
+def get_folder_descendants(folder_id):
+    """
+    Get every folder below the specified folder (its whole subtree, flattened).
+    ---
+    tags:
+      - Folder
+    parameters:
+      - name: folder_id
+        in: path
+        type: string
+        required: true
+        description: Folder ID
+    responses:
+      200:
+        description: Descendant folders ordered by depth (1 = direct children)
+    """
+    with get_db() as (conn, cursor):
+        subtree = fetch_subtree(cursor, folder_id)
+
+    if not subtree:
+        return error("Folder not found", 404)
+
+    return success({
+        "folder_id": folder_id,
+        "descendants": [dict(row) for row in subtree[1:]]
+    })
 
 @folders_bp.route("/<folder_id>", methods=["DELETE"])
 def delete_folder(folder_id):
@@ -127,13 +183,20 @@ def delete_folder(folder_id):
         if not cursor.fetchone():
             return error("Folder not found", 404)
 
-        # Recursively get all descendant folder IDs
+        # Collect the whole subtree once, then delete it with set-based statements
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS folder_subtree (id TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM folder_subtree")
         all_ids = get_all_descendant_folder_ids(folder_id, cursor)
+        cursor.executemany("INSERT INTO folder_subtree (id) VALUES (?)", [(fid,) for fid in all_ids])
 
-        # Clean up associations in file_folders
-        for fid in all_ids:
-            cursor.execute("DELETE FROM file_folders WHERE folder_id = ?", (fid,))
-            cursor.execute("DELETE FROM folders WHERE id = ?", (fid,))
+        # Clean up associations in file_folders and the path index, then the folders
+        # (one statement, so the parent_id foreign key is checked once the whole subtree is gone)
+        cursor.execute("DELETE FROM file_folders WHERE folder_id IN (SELECT id FROM folder_subtree)")
+        cursor.execute("DELETE FROM folder_paths WHERE descendant_id IN (SELECT id FROM folder_subtree)")
+        cursor.execute("DELETE FROM folders WHERE id IN (SELECT id FROM folder_subtree)")
+        cursor.execute("DELETE FROM folder_subtree")
+
+    bump_version("folders")
 
     return success({
         "deleted_folder_ids": all_ids
@@ -162,29 +225,20 @@ def search_folders():
         return error("A search keyword must be provided", 400)
 
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT * FROM folders")
-        all_folders = cursor.fetchall()
-        folder_dict = {f["id"]: dict(f) for f in all_folders}
-
-        def build_full_path(folder_id):
-            path = []
-            while folder_id and folder_id in folder_dict:
-                f = folder_dict[folder_id]
-                path.insert(0, f["name"])
-                folder_id = f["parent_id"]
-            return path
-
         # Find matching folders
         cursor.execute("SELECT * FROM folders WHERE name LIKE ?", (f"%{q}%",))
         matches = cursor.fetchall()
 
+        # Look up the full paths of the matches only
+        full_paths = get_full_paths(cursor, [folder["id"] for folder in matches])
+
         result = []
         for folder in matches:
             result.append({
                 "id": folder["id"],
                 "name": folder["name"],
                 "parent_id": folder["parent_id"],
-                "full_path": build_full_path(folder["id"])
+                "full_path": full_paths.get(folder["id"], [])
             })
 
         return success(result)
@@ -0,0 +1,26 @@
+from flask import Blueprint, current_app
+from utils.response import error
+from utils.metrics import metrics_enabled, render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@metrics_bp.route("", methods=["GET"])
+def get_metrics():
+    """
+    Request latency and SQL metrics of this worker, in the Prometheus text format.
+    ---
+    tags:
+      - Metrics
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Per-route latency histograms, request counts, SQL statements per request, rows fetched and DB time
+      404:
+        description: Metrics are disabled (METRICS=off)
+    """
+    if not metrics_enabled():
+        return error("Metrics are disabled (set METRICS=on)", 404)
+    return current_app.response_class(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,9 +1,40 @@
 from flask import Blueprint, request
-from database import get_db
+from database import get_db, chunked
 from utils.response import success, error
+from utils.versions import bump_version
+from utils.http_cache import versioned_response
+from utils.tag_bitmaps import record_files_changed
 
 tags_bp = Blueprint("tags", __name__)
 
+def invalidate_tag_cache():
+    """
+    Mark the tag dictionary as changed (call after the write has committed).
+
+    Bumping the "tags" version invalidates the cached GET /api/tags body and
+    ETag in every worker process.
+    """
+    bump_version("tags")
+
+def fetch_aliases_by_tag(cursor, tag_ids):
+    """
+    Load the aliases of many tags at once.
+
+    Returns:
+        dict: tag_id -> list of {"id", "name"}
+    """
+    aliases_by_tag = {}
+    for batch in chunked(tag_ids):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"""
+            SELECT id, tag_id, alias FROM tag_aliases
+            WHERE tag_id IN ({placeholders})
+            ORDER BY tag_id, id
+        """, batch)
+        for row in cursor.fetchall():
+            aliases_by_tag.setdefault(row["tag_id"], []).append({"id": row["id"], "name": row["alias"]})
+    return aliases_by_tag
+
 @tags_bp.route("", methods=["POST"]) # /api/tags
 def create_tag():
     """
@@ -83,6 +114,8 @@ def create_tag():
     except Exception as e:
         return error(f"Database write failed: {str(e)}", 500)
 
+    invalidate_tag_cache()
+
     return success({
         "id": tag_id,
         "name": name,
@@ -103,8 +136,10 @@ def get_tags():
         required: false
         description: Tag name or alias (optional)
     responses:
+      304:
+        description: Not modified since the ETag given in If-None-Match
       200:
-        description: Tag information (including aliases)
+        description: Tag information (including aliases), with an ETag for conditional requests
         schema:
           type: object
           properties:
@@ -130,75 +165,62 @@ def get_tags():
     """
     query = request.args.get("q")
 
+    # The full dictionary is served from memory (or as a 304) until a tag or alias changes
+    return versioned_response(
+        ("tags",), lambda: load_tags(query), cache_key=None if query else "tags"
+    )
+
+def load_tags(query=None):
+    """
+    Load tags with their aliases, all of them or those matching a keyword.
+
+    Returns:
+        list: Serialized tags, best match first when a keyword is given, otherwise newest first.
+    """
     with get_db() as (conn, cursor):
         if query:
             q = query.strip()
 
-            # Try to match main tag name
-            cursor.execute("SELECT * FROM tags WHERE name LIKE ?", (f"%{q}%",))
+            # Match tag names and aliases in one ranked query over the trigram index:
+            # prefix matches first, then names before aliases, then shorter terms
+            if len(q) >= 3 and "%" not in q and "_" not in q:
+                match_sql, match_params = "ts.term LIKE ?", [f"%{q}%"]
+            else:
+                # The trigram index cannot serve patterns shorter than 3 characters
+                match_sql, match_params = "instr(lower(ts.term), lower(?)) > 0", [q]
+
+            cursor.execute(f"""
+                SELECT t.id, t.name, t.category,
+                       MIN(
+                           CASE WHEN instr(lower(ts.term), lower(?)) = 1 THEN 0 ELSE 2 END
+                           + CASE ts.kind WHEN 'name' THEN 0 ELSE 1 END
+                       ) AS score,
+                       MIN(length(ts.term)) AS term_length
+                FROM tag_search ts
+                JOIN tags t ON t.id = ts.tag_id
+                WHERE {match_sql}
+                GROUP BY t.id
+                ORDER BY score, term_length, t.id DESC
+            """, [q] + match_params)
             tags = cursor.fetchall()
 
-            if tags:
-                result = []
-                for tag in tags:
-                    cursor.execute("SELECT id, alias FROM tag_aliases WHERE tag_id = ?", (tag["id"],))
-                    aliases = [{"id": row["id"], "name": row["alias"]} for row in cursor.fetchall()]
-
-                    result.append({
-                        "id": tag["id"],
-                        "name": tag["name"],
-                        "category": tag["category"],
-                        "aliases": aliases
-                    })
-                return success(result)
-
-            # Otherwise search in aliases
-            cursor.execute("SELECT * FROM tag_aliases WHERE alias LIKE ?", (f"%{q}%",))
-            alias_rows = cursor.fetchall()
-
-            if alias_rows:
-                result = []
-                seen_tag_ids = set()
-
-                for alias in alias_rows:
-                    tag_id = alias["tag_id"]
-                    if tag_id in seen_tag_ids:
-                        continue  # Remove duplicates
-                    seen_tag_ids.add(tag_id)
-
-                    cursor.execute("SELECT * FROM tags WHERE id = ?", (tag_id,))
-                    tag = cursor.fetchone()
-                    if tag:
-                        cursor.execute("SELECT id, alias FROM tag_aliases WHERE tag_id = ?", (tag_id,))
-                        aliases = [{"id": row["id"], "name": row["alias"]} for row in cursor.fetchall()]
-                        result.append({
-                            "id": tag["id"],
-                            "name": tag["name"],
-                            "category": tag["category"],
-                            "aliases": aliases
-                        })
-
-                return success(result)
-
-            # No matches found
-            return success([])
-
         else:
             # No keyword provided, return all main tags
             cursor.execute("SELECT * FROM tags ORDER BY id DESC")
             tags = cursor.fetchall()
-            result = []
-            for tag in tags:
-                cursor.execute("SELECT id, alias FROM tag_aliases WHERE tag_id = ?", (tag["id"],))
-                aliases = [{"id": row["id"], "name": row["alias"]} for row in cursor.fetchall()]
-                
-                result.append({
-                    "id": tag["id"],
-                    "name": tag["name"],
-                    "category": tag["category"],
-                    "aliases": aliases
-                })
-            return success(result)
+
+        # Hydrate aliases for all returned tags in one query
+        aliases_by_tag = fetch_aliases_by_tag(cursor, [tag["id"] for tag in tags])
+
+    result = []
+    for tag in tags:
+        result.append({
+            "id": tag["id"],
+            "name": tag["name"],
+            "category": tag["category"],
+            "aliases": aliases_by_tag.get(tag["id"], [])
+        })
+    return result
 
 @tags_bp.route("/<int:tag_id>/alias", methods=["POST"])
 def add_alias(tag_id):
@@ -264,6 +286,8 @@ def add_alias(tag_id):
         # Insert the alias
         cursor.execute("INSERT INTO tag_aliases (tag_id, alias) VALUES (?, ?)", (tag_id, alias))
 
+    invalidate_tag_cache()
+
     return success({
         "tag_id": tag_id,
         "alias": alias
@@ -272,7 +296,7 @@ def add_alias(tag_id):
 @tags_bp.route("/<int:tag_id>", methods=["DELETE"])
 def delete_tag(tag_id):
     """
-    Delete a main tag (along with all its aliases).
+    Delete a main tag (along with all its aliases and file bindings).
     ---
     tags:
       - Tag
@@ -292,9 +316,13 @@ def delete_tag(tag_id):
         if not tag:
             return error("Tag not found", 404)
 
-        # Delete main tag (and its aliases)
-        cursor.execute("DELETE FROM tags WHERE id = ?", (tag_id,))
+        # Delete aliases and file bindings first (they reference the tag), then the main tag
         cursor.execute("DELETE FROM tag_aliases WHERE tag_id = ?", (tag_id,))
+        cursor.execute("DELETE FROM file_tags WHERE tag_id = ?", (tag_id,))
+        cursor.execute("DELETE FROM tags WHERE id = ?", (tag_id,))
+
+    invalidate_tag_cache()
+    record_files_changed()
 
     return success({"deleted_tag_id": tag_id}, 200)
 
@@ -323,4 +351,6 @@ def delete_alias(alias_id):
 
         cursor.execute("DELETE FROM tag_aliases WHERE id = ?", (alias_id,))
 
+    invalidate_tag_cache()
+
     return success({"deleted_alias_id": alias_id}, 200)
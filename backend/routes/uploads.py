@@ -0,0 +1,525 @@
+import os
+import time
+import hashlib
+import threading
+import json
+from contextlib import contextmanager
+from flask import Blueprint, request
+from config import settings
+from database import get_db, chunked
+from utils.idgen import generate_uuid
+from utils.response import success, error
+from utils.blobstore import UPLOAD_DIR, add_blob_ref, resolve_path
+from utils.tag_bitmaps import record_files_changed
+from routes.files import insert_file_record, schedule_background_work, is_id_list, find_missing_ids
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+uploads_bp = Blueprint("uploads", __name__)
+
+# In-progress uploads are written here and moved into UPLOAD_DIR on completion
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, ".partial")
+
+STREAM_BLOCK_SIZE = 64 * 1024          # Bytes read from the request per iteration
+MAX_CHUNK_SIZE = 64 * 1024 * 1024      # Largest body accepted by one PUT
+
+# upload_id -> (offset, sha256 object) for uploads this process has been receiving.
+# If a chunk arrives at another worker (or after a restart) the hash is rebuilt
+# from the temp file once, then continues incrementally.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+# Sessions without a chunk for this long are deleted with their data (see expire_upload_sessions)
+UPLOAD_SESSION_TTL = settings["UPLOAD_SESSION_TTL_HOURS"] * 3600
+EXPIRY_INTERVAL = 600  # Seconds between two expiry sweeps of one process
+_last_expiry = {"at": 0.0}
+
+# upload_ids being written by this process (only used where flock is unavailable)
+_busy = set()
+
+class UploadBusy(Exception):
+    """Another request is writing to or completing the same upload."""
+
+@contextmanager
+def _locked_upload(upload_id, f):
+    """
+    Hold the upload's lock for the block: an exclusive flock on its open temp
+    file, so requests in other threads and worker processes are serialized.
+
+    Raises:
+        UploadBusy: If another request holds the lock (never waits).
+    """
+    if fcntl:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy(upload_id)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        with _hashers_lock:
+            if upload_id in _busy:
+                raise UploadBusy(upload_id)
+            _busy.add(upload_id)
+        try:
+            yield
+        finally:
+            with _hashers_lock:
+                _busy.discard(upload_id)
+
+def _get_hasher(upload_id, temp_path, offset):
+    """Return a sha256 object that has consumed exactly the first `offset` bytes of the temp file."""
+    with _hashers_lock:
+        cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    with open(temp_path, "rb") as f:
+        remaining = offset
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+def _load_session(cursor, upload_id):
+    cursor.execute("SELECT * FROM upload_sessions WHERE id = ?", (upload_id,))
+    return cursor.fetchone()
+
+def _delete_session(upload_id):
+    with get_db() as (conn, cursor):
+        cursor.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+def expire_upload_sessions(ttl=UPLOAD_SESSION_TTL, now=None):
+    """
+    Delete upload sessions that received no chunk for ttl seconds, with their
+    temp files, and .part files left behind without a session.
+
+    The temp file's modification time is the last activity; sessions being
+    written to right now are skipped.
+
+    Returns:
+        int: Number of sessions and stray files removed.
+    """
+    cutoff = (now or time.time()) - ttl
+    removed = 0
+
+    with get_db() as (conn, cursor):
+        cursor.execute(
+            "SELECT id, temp_path FROM upload_sessions WHERE created_at < datetime(?, 'unixepoch')",
+            (cutoff,)
+        )
+        candidates = cursor.fetchall()
+
+    for session in candidates:
+        try:
+            f = open(session["temp_path"], "r+b")
+        except FileNotFoundError:
+            _delete_session(session["id"])
+            removed += 1
+            continue
+
+        with f:
+            if os.fstat(f.fileno()).st_mtime >= cutoff:
+                continue  # Chunks arrived recently
+            try:
+                with _locked_upload(session["id"], f):
+                    _delete_session(session["id"])
+                    os.remove(session["temp_path"])
+            except UploadBusy:
+                continue
+        removed += 1
+
+    # Temp files whose session is gone (e.g. the process died between steps)
+    if os.path.isdir(PARTIAL_DIR):
+        stale = {}
+        for entry in os.scandir(PARTIAL_DIR):
+            if entry.name.endswith(".part") and entry.stat().st_mtime < cutoff:
+                stale[entry.name[:-len(".part")]] = entry.path
+        with get_db() as (conn, cursor):
+            for batch in chunked(stale):
+                placeholders = ','.join(['?'] * len(batch))
+                cursor.execute(f"SELECT id FROM upload_sessions WHERE id IN ({placeholders})", batch)
+                for row in cursor.fetchall():
+                    stale.pop(row["id"], None)
+        for path in stale.values():
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    return removed
+
+def _maybe_expire_upload_sessions():
+    """Run expire_upload_sessions at most every EXPIRY_INTERVAL seconds per process."""
+    now = time.time()
+    with _hashers_lock:
+        if now - _last_expiry["at"] < EXPIRY_INTERVAL:
+            return
+        _last_expiry["at"] = now
+    expire_upload_sessions(now=now)
+
+@uploads_bp.route("", methods=["POST"])
+def init_upload():
+    """
+    Start a resumable chunked upload.
+    ---
+    tags:
+      - Upload
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            name:
+              type: string
+              example: Symphony5.pdf
+            size:
+              type: integer
+              description: Total size in bytes (optional, checked on completion)
+            tags:
+              type: array
+              items: { type: integer }
+            folders:
+              type: array
+              items: { type: string }
+    responses:
+      201:
+        description: Upload session created, send chunks with PUT starting at offset 0
+    """
+    data = request.get_json() or {}
+    name = data.get("name")
+    size = data.get("size")
+    tag_ids = data.get("tags", [])
+    folder_ids = data.get("folders", [])
+
+    if not name:
+        return error("The name field is required", 400)
+
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return error("size must be a non-negative integer", 400)
+
+    if not is_id_list(tag_ids) or not is_id_list(folder_ids):
+        return error("tags and folders must be arrays of ids", 400)
+
+    # Checked now so a typo fails here rather than after the whole file was sent
+    with get_db() as (conn, cursor):
+        missing_tags = find_missing_ids(cursor, "tags", tag_ids)
+        missing_folders = find_missing_ids(cursor, "folders", folder_ids)
+    if missing_tags:
+        return error(f"Tag ID not found: {missing_tags[0]}", 400)
+    if missing_folders:
+        return error(f"Folder ID not found: {missing_folders[0]}", 400)
+
+    _maybe_expire_upload_sessions()
+
+    upload_id = generate_uuid()
+    temp_path = os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    open(temp_path, "wb").close()
+
+    with get_db() as (conn, cursor):
+        cursor.execute("""
+            INSERT INTO upload_sessions (id, name, size, tags, folders, temp_path)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (upload_id, name, size, json.dumps(tag_ids), json.dumps(folder_ids), temp_path))
+
+    return success({
+        "upload_id": upload_id,
+        "offset": 0
+    }, code=201)
+
+@uploads_bp.route("/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    """
+    Get the acknowledged offset of an upload (where to resume from).
+    ---
+    tags:
+      - Upload
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Current upload state
+    """
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+        if not session:
+            return error("Upload not found", 404)
+
+    return success({
+        "upload_id": upload_id,
+        "name": session["name"],
+        "size": session["size"],
+        "offset": session["received"]
+    })
+
+@uploads_bp.route("/<upload_id>", methods=["PUT"])
+def put_chunk(upload_id):
+    """
+    Append a chunk (raw request body) to an upload.
+    ---
+    tags:
+      - Upload
+    consumes:
+      - application/octet-stream
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+      - name: offset
+        in: query
+        type: integer
+        required: true
+        description: Byte offset of this chunk, must equal the acknowledged offset
+    responses:
+      200:
+        description: Chunk stored, returns the new acknowledged offset
+      409:
+        description: Offset mismatch, resume from the returned offset
+    """
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return error("offset must be an integer", 400)
+
+    length = request.content_length
+    if length is not None and length > MAX_CHUNK_SIZE:
+        return error(f"Chunk too large (max {MAX_CHUNK_SIZE} bytes)", 413)
+
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+        if not session:
+            return error("Upload not found", 404)
+
+    temp_path = session["temp_path"]
+    try:
+        f = open(temp_path, "r+b")
+    except FileNotFoundError:
+        return error("Upload not found", 404)
+
+    with f:
+        try:
+            with _locked_upload(upload_id, f):
+                return _write_chunk(upload_id, f, offset)
+        except UploadBusy:
+            return error("Another request is writing this upload, retry shortly", 409)
+
+def _write_chunk(upload_id, f, offset):
+    """Append the request body at offset while holding the upload's lock."""
+    # Re-read under the lock: a concurrent request may have moved the offset
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+    if not session:
+        return error("Upload not found", 404)
+
+    received = session["received"]
+    if offset != received:
+        return error(f"Offset mismatch, expected {received}", 409)
+
+    hasher = _get_hasher(upload_id, session["temp_path"], received)
+    written = 0
+
+    # Stream the body to disk; bytes past the acknowledged offset from a dropped
+    # request are discarded by the truncate
+    f.seek(received)
+    f.truncate()
+    try:
+        while written <= MAX_CHUNK_SIZE:
+            block = request.stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            f.write(block)
+            hasher.update(block)
+            written += len(block)
+    except Exception as e:
+        f.truncate(received)
+        return error(f"Failed to receive chunk: {str(e)}", 400)
+
+    if written > MAX_CHUNK_SIZE:
+        f.truncate(received)
+        return error(f"Chunk too large (max {MAX_CHUNK_SIZE} bytes)", 413)
+
+    if session["size"] is not None and received + written > session["size"]:
+        f.truncate(received)
+        return error("Upload exceeds the declared size", 400)
+
+    # Make the bytes durable in the file before acknowledging them
+    f.flush()
+    new_offset = received + written
+    with get_db() as (conn, cursor):
+        cursor.execute(
+            "UPDATE upload_sessions SET received = ? WHERE id = ? AND received = ?",
+            (new_offset, upload_id, received)
+        )
+        updated = cursor.rowcount == 1
+    if not updated:
+        f.truncate(received)
+        return error("Upload was modified concurrently", 409)
+
+    with _hashers_lock:
+        _hashers[upload_id] = (new_offset, hasher)
+
+    return success({
+        "upload_id": upload_id,
+        "offset": new_offset
+    })
+
+@uploads_bp.route("/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id):
+    """
+    Finish an upload: store the file and create its record with tags and folders.
+    ---
+    tags:
+      - Upload
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            sha256:
+              type: string
+              description: Expected hex digest (optional, verified if given)
+    responses:
+      201:
+        description: Upload successful
+    """
+    data = request.get_json(silent=True) or {}
+    expected_sha256 = data.get("sha256")
+
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+        if not session:
+            return error("Upload not found", 404)
+
+    try:
+        f = open(session["temp_path"], "r+b")
+    except FileNotFoundError:
+        return error("Upload not found", 404)
+
+    with f:
+        try:
+            with _locked_upload(upload_id, f):
+                return _finish_upload(upload_id, f, expected_sha256)
+        except UploadBusy:
+            return error("Another request is writing this upload, retry shortly", 409)
+
+def _finish_upload(upload_id, f, expected_sha256):
+    """Store a fully received upload while holding its lock (no chunk can be written meanwhile)."""
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+    if not session:
+        return error("Upload not found", 404)
+
+    received = session["received"]
+    if session["size"] is not None and received != session["size"]:
+        return error(f"Upload incomplete: {received} of {session['size']} bytes received", 409)
+
+    # The digest below covers the first `received` bytes; the file must hold exactly those
+    on_disk = os.fstat(f.fileno()).st_size
+    if on_disk > received:
+        f.truncate(received)  # Unacknowledged bytes of an interrupted chunk
+    elif on_disk < received:
+        with get_db() as (conn, cursor):
+            cursor.execute("UPDATE upload_sessions SET received = ? WHERE id = ?", (on_disk, upload_id))
+        with _hashers_lock:
+            _hashers.pop(upload_id, None)
+        return error(f"Upload data is incomplete, resume from offset {on_disk}", 409)
+
+    sha256 = _get_hasher(upload_id, session["temp_path"], received).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        return error("sha256 mismatch", 422)
+
+    file_id = generate_uuid()
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    temp_path = session["temp_path"]
+
+    stored_path = None
+    try:
+        with get_db() as (conn, cursor):
+            save_path, created = add_blob_ref(cursor, sha256, received, temp_path)
+            if created:
+                stored_path = save_path
+            insert_file_record(
+                cursor, file_id, session["name"], save_path, received, uploaded_at,
+                json.loads(session["tags"]), json.loads(session["folders"]), sha256=sha256
+            )
+            cursor.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+    except Exception as e:
+        # Put the data back so the client can retry completion
+        if stored_path and os.path.exists(resolve_path(stored_path)):
+            os.replace(resolve_path(stored_path), temp_path)
+        if isinstance(e, ValueError):
+            # A tag or folder was deleted after the upload started
+            return error(str(e), 409)
+        return error(f"Database write failed: {str(e)}", 500)
+
+    # Content that was already stored is not kept twice
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    record_files_changed()
+    schedule_background_work(file_id, save_path)
+
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+    return success({
+        "file_id": file_id,
+        "name": session["name"],
+        "uploaded_at": uploaded_at,
+        "size": received,
+        "sha256": sha256
+    }, code=201)
+
+@uploads_bp.route("/<upload_id>", methods=["DELETE"])
+def abort_upload(upload_id):
+    """
+    Abort an upload and discard the received data.
+    ---
+    tags:
+      - Upload
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Upload aborted
+    """
+    with get_db() as (conn, cursor):
+        session = _load_session(cursor, upload_id)
+        if not session:
+            return error("Upload not found", 404)
+
+    # A chunk still being written fails its compare-and-set once the row is gone
+    _delete_session(upload_id)
+    if os.path.exists(session["temp_path"]):
+        os.remove(session["temp_path"])
+
+    return success({"aborted_upload_id": upload_id})
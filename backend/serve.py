@@ -0,0 +1,72 @@
+import sys
+import argparse
+from config import settings
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+'''
+Production entry point: serves the app with gunicorn's prefork server.
+
+Usage:
+    python serve.py                               # HOST/PORT/WORKERS/THREADS from config.py
+    python serve.py --workers 4 --threads 8 --port 8000
+    APP_CONFIG=/srv/scores/config.json python serve.py
+
+The app is built (and the schema migrated) once in the master process, whose
+SQLite connection is closed before forking; every forked worker warms up (see app.warm_up) before it accepts requests.
+With more than one thread per worker, requests run on gunicorn's threaded
+worker; each thread gets its own SQLite connection.
+
+Requires gunicorn (pip install gunicorn); `python app.py` still starts the
+development server.
+'''
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with a prefork WSGI server")
+    parser.add_argument("--host", default=settings["HOST"])
+    parser.add_argument("--port", type=int, default=settings["PORT"])
+    parser.add_argument("--workers", type=int, default=settings["WORKERS"], help="worker processes")
+    parser.add_argument("--threads", type=int, default=settings["THREADS"], help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=60, help="seconds before a silent worker is restarted")
+    return parser.parse_args(argv)
+
+def build_server(app, options):
+    """Wrap a Flask app in a gunicorn application with the given settings."""
+    class PreforkServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    return PreforkServer()
+
+def main(argv=None):
+    args = parse_args(argv)
+    if BaseApplication is None:
+        sys.exit("❌ gunicorn is not installed (pip install gunicorn)")
+    if args.workers < 1 or args.threads < 1:
+        sys.exit("❌ --workers and --threads must be at least 1")
+
+    from app import create_app, warm_up
+    from database import close_db
+    app = create_app()
+    # The migrations left this thread's connection open; workers must not inherit it across fork()
+    close_db()
+
+    build_server(app, {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "timeout": args.timeout,
+        "preload_app": True,
+        "post_fork": lambda server, worker: warm_up(app),
+    }).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import tempfile
+from io import BytesIO
+import pytest
+
+'''
+Shared fixtures: every test gets an app on a fresh, fully migrated database.
+
+Run from backend/:
+    python -m pytest -q
+'''
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# config.py reads the settings once at import: point them at a scratch folder first
+SCRATCH_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update(
+    DATABASE_PATH=os.path.join(SCRATCH_DIR, "unused.db"),
+    UPLOAD_DIR=os.path.join(SCRATCH_DIR, "uploads"),
+    API_DOCS="off",
+    METRICS="off",
+    SLOW_QUERY_MS="0",
+)
+
+import database
+import routes.files
+import utils.tag_bitmaps
+from app import create_app
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    # Thumbnails and text extraction run in worker processes; tests don't need them
+    monkeypatch.setattr(routes.files, "schedule_thumbnails", lambda file_id, path: None)
+    monkeypatch.setattr(routes.files, "schedule_text_extraction", lambda file_id, path: None)
+    # Start without an index from an earlier test (it is built in the background on first use)
+    monkeypatch.setattr(utils.tag_bitmaps, "_state", {"index": None, "building": False})
+
+    app = create_app()
+    app.config["TESTING"] = True
+    yield app
+    database.close_db()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def upload(client, name, tags=(), folders=(), content=None):
+    """Upload a small PDF through the API and return its file id."""
+    content = content if content is not None else f"%PDF-1.4 {name}".encode()
+    response = client.post("/api/files/upload", data={
+        "file": (BytesIO(content), name),
+        "tags": json.dumps(list(tags)),
+        "folders": json.dumps(list(folders)),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["data"]["file_id"]
+
+@pytest.fixture
+def library(client):
+    """
+    A small library created through the API.
+
+    Returns:
+        dict: "tags" (name -> id), "folders" (name -> id), "files" (name -> id)
+    """
+    tags = {}
+    for name, category in (("bach", "composer"), ("chopin", "composer"), ("piano", "instrument"), ("violin", "instrument")):
+        response = client.post("/api/tags", json={"name": name, "category": category})
+        tags[name] = response.get_json()["data"]["id"]
+
+    folders = {}
+    for name, parent in (("scores", None), ("baroque", "scores"), ("romantic", "scores"), ("inbox", None)):
+        response = client.post("/api/folders", json={"name": name, "parent_id": folders.get(parent)})
+        folders[name] = response.get_json()["data"]["id"]
+
+    files = {}
+    for name, file_tags, file_folders in (
+        ("prelude.pdf", ("bach", "piano"), ("baroque",)),
+        ("partita.pdf", ("bach", "violin"), ("baroque",)),
+        ("fugue.pdf", ("bach", "piano"), ("scores",)),
+        ("nocturne.pdf", ("chopin", "piano"), ("romantic",)),
+        ("etude.pdf", ("chopin", "piano"), ("romantic", "inbox")),
+        ("sketch.pdf", (), ("inbox",)),
+    ):
+        files[name] = upload(
+            client, name,
+            tags=[tags[t] for t in file_tags],
+            folders=[folders[f] for f in file_folders],
+        )
+
+    return {"tags": tags, "folders": folders, "files": files}
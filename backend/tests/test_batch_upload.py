@@ -0,0 +1,51 @@
+import json
+from io import BytesIO
+import pytest
+from routes.files import upload_files_batch
+
+def batch_upload(client, names, **form):
+    data = {key: json.dumps(value) for key, value in form.items()}
+    data["files"] = [(BytesIO(f"%PDF-1.4 {name}".encode()), name) for name in names]
+    return client.post("/api/files/upload/batch", data=data, content_type="multipart/form-data")
+
+def test_batch_docstring_is_valid_yaml():
+    # flasgger parses everything after "---"; an unquoted {"tags": ...} broke the whole live spec
+    yaml = pytest.importorskip("yaml")
+    spec = yaml.safe_load(upload_files_batch.__doc__.split("---", 1)[1])
+    per_file = next(p for p in spec["parameters"] if p["name"] == "per_file")
+    assert per_file["description"].startswith('JSON array aligned with files, each item {"tags": [...]')
+
+def test_batch_upload_with_per_file_relations(client, library):
+    tags, folders = library["tags"], library["folders"]
+    response = batch_upload(
+        client, ["aria.pdf", "gigue.pdf", "menuet.pdf"],
+        tags=[tags["bach"]],
+        per_file=[{"tags": [tags["violin"]], "folders": [folders["baroque"]]}, {"tags": [], "folders": []}, "oops"],
+    )
+    assert response.status_code == 207
+    data = response.get_json()["data"]
+    assert (data["uploaded"], data["failed"]) == (2, 1)
+    assert data["files"][2]["status"] == "error"
+
+    aria = client.get(f"/api/files/{data['files'][0]['file_id']}").get_json()["data"]
+    assert sorted(tag["name"] for tag in aria["tags"]) == ["bach", "violin"]
+    assert [folder["name"] for folder in aria["folders"]] == ["baroque"]
+    gigue = client.get(f"/api/files/{data['files'][1]['file_id']}").get_json()["data"]
+    assert [tag["name"] for tag in gigue["tags"]] == ["bach"]
+
+@pytest.mark.parametrize("form", [{"tags": [{"x": 1}]}, {"folders": [[1]]}, {"tags": [True]}])
+def test_batch_upload_rejects_malformed_shared_ids(client, library, form):
+    response = batch_upload(client, ["aria.pdf"], **form)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "tags and folders must be arrays of ids"
+
+def test_batch_upload_reports_malformed_per_file_ids(client, library):
+    tags = library["tags"]
+    response = batch_upload(
+        client, ["aria.pdf", "gigue.pdf"],
+        per_file=[{"tags": [{"x": 1}], "folders": []}, {"tags": [tags["bach"]], "folders": []}],
+    )
+    assert response.status_code == 207
+    data = response.get_json()["data"]
+    assert (data["uploaded"], data["failed"]) == (1, 1)
+    assert data["files"][0]["error"] == "per_file items must be objects with tags and folders arrays of ids"
@@ -0,0 +1,118 @@
+import os
+import hashlib
+import pytest
+import database
+import migrations
+import migrations.m005_blobs
+import routes.files
+from migrations import run_migrations
+from utils.blobstore import UPLOAD_DIR, blob_path, remove_released_blob, resolve_path
+from conftest import upload
+
+def blob_row(sha256):
+    with database.get_db() as (conn, cursor):
+        cursor.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,))
+        return cursor.fetchone()
+
+def test_identical_uploads_share_one_blob(client):
+    content = b"%PDF-1.4 shared"
+    sha256 = hashlib.sha256(content).hexdigest()
+    first = upload(client, "a.pdf", content=content)
+    second = upload(client, "b.pdf", content=content)
+    assert blob_row(sha256)["ref_count"] == 2
+
+    client.delete(f"/api/files/{first}")
+    assert os.path.exists(resolve_path(blob_path(sha256)))
+    assert client.get(f"/api/files/{second}/content").data == content
+
+    client.delete(f"/api/files/{second}")
+    assert blob_row(sha256) is None
+    assert not os.path.exists(resolve_path(blob_path(sha256)))
+
+def test_upload_stores_content_released_since_the_lookup(client, monkeypatch):
+    # blob_exists() said yes, then the last file with this content was deleted
+    monkeypatch.setattr(routes.files, "blob_exists", lambda cursor, sha256: True)
+    content = b"%PDF-1.4 released meanwhile"
+    file_id = upload(client, "a.pdf", content=content)
+    assert blob_row(hashlib.sha256(content).hexdigest())["ref_count"] == 1
+    assert client.get(f"/api/files/{file_id}/content").data == content
+
+def test_delete_keeps_a_blob_stored_again_after_its_commit(client, monkeypatch):
+    content = b"%PDF-1.4 uploaded again"
+    file_id = upload(client, "a.pdf", content=content)
+
+    # Another upload of the same content lands between the delete's commit and its unlink
+    again = {}
+    def upload_again(deleted_id):
+        again["file_id"] = upload(client, "b.pdf", content=content)
+    monkeypatch.setattr(routes.files, "remove_thumbnails", upload_again)
+
+    assert client.delete(f"/api/files/{file_id}").status_code == 200
+    assert client.get(f"/api/files/{again['file_id']}/content").data == content
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert remove_released_blob(sha256, resolve_path(blob_path(sha256))) is False
+
+def test_blob_migration_keeps_originals_until_it_commits(tmp_path, monkeypatch):
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "old.db"))
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations[:4])
+    run_migrations()
+
+    original = tmp_path / "score.pdf"
+    original.write_bytes(b"%PDF-1.4 legacy")
+    with database.get_db() as (conn, cursor):
+        cursor.execute(
+            "INSERT INTO files (id, name, upload_path, size) VALUES ('f1', 'score.pdf', ?, 15)",
+            (str(original),)
+        )
+
+    upgrade = migrations.m005_blobs.upgrade
+    def upgrade_then_fail(cursor):
+        upgrade(cursor)
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations[:5])
+    monkeypatch.setattr(migrations.m005_blobs, "upgrade", upgrade_then_fail)
+    with pytest.raises(RuntimeError):
+        run_migrations()
+    assert original.exists()
+
+    monkeypatch.setattr(migrations.m005_blobs, "upgrade", upgrade)
+    assert run_migrations() == [5]
+    assert not original.exists()
+    with database.get_db() as (conn, cursor):
+        cursor.execute("SELECT upload_path FROM files WHERE id = 'f1'")
+        with open(resolve_path(cursor.fetchone()["upload_path"]), "rb") as f:
+            assert f.read() == b"%PDF-1.4 legacy"
+    database.close_db()
+
+def test_stored_paths_are_relative_to_the_upload_folder(client):
+    content = b"%PDF-1.4 relative"
+    sha256 = hashlib.sha256(content).hexdigest()
+    file_id = upload(client, "a.pdf", content=content)
+    expected = f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+    assert client.get(f"/api/files/{file_id}").get_json()["data"]["upload_path"] == expected
+    assert blob_row(sha256)["path"] == expected
+
+def test_path_migration_makes_stored_paths_relative(tmp_path, monkeypatch):
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "old.db"))
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations[:8])
+    run_migrations()
+
+    sha256 = "ab" * 32
+    absolute = os.path.join(UPLOAD_DIR, "blobs", "ab", "ab", f"{sha256}.pdf")
+    with database.get_db() as (conn, cursor):
+        cursor.execute("INSERT INTO blobs (sha256, path, size, ref_count) VALUES (?, ?, 1, 1)", (sha256, absolute))
+        cursor.executemany("INSERT INTO files (id, name, upload_path, size, sha256) VALUES (?, ?, ?, 1, ?)", [
+            ("f1", "a.pdf", absolute, sha256),
+            ("f2", "b.pdf", "/elsewhere/b.pdf", None),
+        ])
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations)
+    assert run_migrations() == [9]
+    with database.get_db() as (conn, cursor):
+        cursor.execute("SELECT path FROM blobs")
+        assert cursor.fetchone()["path"] == blob_path(sha256)
+        cursor.execute("SELECT id, upload_path FROM files ORDER BY id")
+        assert [tuple(row) for row in cursor.fetchall()] == [("f1", blob_path(sha256)), ("f2", "/elsewhere/b.pdf")]
+    database.close_db()
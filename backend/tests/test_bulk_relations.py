@@ -0,0 +1,59 @@
+import io
+import pytest
+
+def bulk(client, **body):
+    return client.post("/api/files/bulk/relations", json=body)
+
+def names_in(client, folder_id):
+    response = client.get(f"/api/files?folder_ids={folder_id}&size=50")
+    return sorted(f["name"] for f in response.get_json()["data"]["files"])
+
+def test_bulk_by_file_ids(client, library):
+    tags, folders, files = library["tags"], library["folders"], library["files"]
+    response = bulk(
+        client,
+        file_ids=[files["prelude.pdf"], files["fugue.pdf"], "no-such-file"],
+        add_folders=[folders["inbox"]],
+        remove_tags=[tags["piano"]],
+    )
+    assert response.status_code == 200
+    assert response.get_json()["data"] == {
+        "matched_files": 2, "tags_added": 0, "tags_removed": 2, "folders_added": 2, "folders_removed": 0
+    }
+    assert names_in(client, folders["inbox"]) == ["etude.pdf", "fugue.pdf", "prelude.pdf", "sketch.pdf"]
+
+def test_bulk_by_recursive_filter(client, library):
+    tags, folders = library["tags"], library["folders"]
+    response = bulk(client, filter={"folder_ids": [folders["scores"]], "recursive": True}, add_tags=[tags["violin"]])
+    assert response.get_json()["data"]["matched_files"] == 5
+
+    response = bulk(client, filter={"folder_ids": [folders["scores"]], "recursive": False}, remove_tags=[tags["violin"]])
+    assert response.get_json()["data"]["matched_files"] == 1
+
+@pytest.mark.parametrize("body", [
+    {"file_ids": [{"a": 1}], "add_tags": [1]},
+    {"file_ids": [7], "add_tags": [1]},
+    {"file_ids": ["x"], "add_tags": [[1]]},
+    {"filter": {"tag_ids": [{"a": 1}]}, "add_tags": [1]},
+    {"filter": {"folder_ids": ["x"], "recursive": "false"}, "add_tags": [1]},
+    {"filter": {"folder_ids": ["x"], "recursive": 1}, "add_tags": [1]},
+])
+def test_bulk_rejects_malformed_ids(client, library, body):
+    response = bulk(client, **body)
+    assert response.status_code == 400, response.get_json()
+
+@pytest.mark.parametrize("body", [
+    {"tags": [{"x": 1}], "folders": []},
+    {"tags": [], "folders": [["x"]]},
+    {"tags": [True], "folders": []},
+])
+def test_update_relations_rejects_malformed_ids(client, library, body):
+    response = client.put(f"/api/files/{library['files']['prelude.pdf']}", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "tags and folders must be arrays of ids"
+
+def test_upload_rejects_malformed_ids(client):
+    response = client.post("/api/files/upload", data={
+        "file": (io.BytesIO(b"%PDF-1.4 x"), "a.pdf"), "tags": '[{"x": 1}]',
+    }, content_type="multipart/form-data")
+    assert response.status_code == 400
@@ -0,0 +1,41 @@
+import pytest
+import utils.tag_bitmaps as tag_bitmaps
+from utils.tag_bitmaps import warm_tag_bitmaps
+
+def facets(client, query):
+    response = client.get(f"/api/files?{query}&facets=category")
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["data"]["facets"]
+
+def counts(result):
+    return {category: {tag["name"]: tag["count"] for tag in tags} for category, tags in result.items()}
+
+def test_facet_counts(client, library):
+    tags, folders = library["tags"], library["folders"]
+    warm_tag_bitmaps()
+    assert counts(facets(client, f"tag_ids={tags['piano']}")) == {"composer": {"bach": 2, "chopin": 2}}
+    assert counts(facets(client, f"folder_ids={folders['baroque']}")) == {
+        "composer": {"bach": 2}, "instrument": {"piano": 1, "violin": 1}
+    }
+    assert counts(facets(client, f"tag_ids={tags['piano']}&folder_ids={folders['scores']}&recursive=true")) == {
+        "composer": {"bach": 2, "chopin": 2}
+    }
+
+@pytest.mark.parametrize("query", [
+    "tag_ids={bach}",
+    "tag_ids={bach},{piano}",
+    "tag_ids={bach},{bach}",
+    "folder_ids={romantic}",
+    "folder_ids={romantic},{inbox}",
+    "tag_ids={chopin}&folder_ids={inbox}",
+    "folder_ids={scores}&recursive=true",
+    "tag_ids={piano}&folder_ids={scores}&recursive=true",
+])
+def test_bitmap_and_sql_facets_agree(client, library, monkeypatch, query):
+    query = query.format(**library["tags"], **library["folders"])
+    warm_tag_bitmaps()
+    from_bitmaps = facets(client, query)
+
+    # While the index is being rebuilt the counts come from SQL
+    monkeypatch.setattr(tag_bitmaps, "_state", {"index": None, "building": True})
+    assert facets(client, query) == from_bitmaps
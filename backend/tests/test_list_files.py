@@ -0,0 +1,49 @@
+import pytest
+import database
+from utils.tag_bitmaps import warm_tag_bitmaps
+from conftest import upload
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Collect every statement SQLite runs from here on (connections are reopened to attach the callback)."""
+    statements = []
+    monkeypatch.setattr(database, "TRACE_CALLBACKS", [statements.append])
+    database.close_db()
+    yield statements
+    database.close_db()
+
+def statements_for(client, traced, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    del traced[:]
+    response = client.get(url)  # Second run: caches and the tag bitmaps are warm
+    files = response.get_json()["data"]["files"]
+    return len(traced), files
+
+def test_hydration_does_not_grow_with_the_page(client, library, traced):
+    tags, folders = library["tags"], library["folders"]
+    for n in range(30):
+        upload(client, f"etude-{n}.pdf", tags=[tags["chopin"], tags["piano"]], folders=[folders["romantic"], folders["inbox"]])
+    warm_tag_bitmaps()
+
+    for query in (
+        f"tag_ids={tags['piano']}",
+        f"folder_ids={folders['romantic']}",
+        f"folder_ids={folders['scores']}&recursive=true&tag_ids={tags['chopin']}",
+    ):
+        one, files = statements_for(client, traced, f"/api/files?size=1&{query}")
+        assert len(files) == 1
+        fifty, files = statements_for(client, traced, f"/api/files?size=50&{query}")
+        assert len(files) > 30
+        assert one == fifty, query
+
+def test_files_carry_their_tags_and_folder_paths(client, library):
+    tags, folders, files = library["tags"], library["folders"], library["files"]
+    response = client.get(f"/api/files?folder_ids={folders['romantic']}")
+    by_name = {f["name"]: f for f in response.get_json()["data"]["files"]}
+    assert set(by_name) == {"nocturne.pdf", "etude.pdf"}
+
+    etude = by_name["etude.pdf"]
+    assert etude["id"] == files["etude.pdf"]
+    assert sorted(tag["name"] for tag in etude["tags"]) == ["chopin", "piano"]
+    assert sorted(folder["full_path"] for folder in etude["folders"]) == [["inbox"], ["scores", "romantic"]]
@@ -0,0 +1,143 @@
+import re
+import database
+from utils.tag_bitmaps import warm_tag_bitmaps
+
+'''
+Every statement the routes issue must be answered through an index: the
+statements are captured while exercising the API, then run through
+EXPLAIN QUERY PLAN, and any full scan of a stored table fails the test
+unless the statement reads the whole table on purpose.
+'''
+
+# Statements that read a whole table by design
+WHOLE_TABLE_READS = {
+    "SELECT * FROM tags ORDER BY id DESC",                          # tag list, cached by version
+    "SELECT * FROM folders",                                        # folder tree, cached by version
+    "SELECT * FROM folders WHERE name LIKE ?",                      # '%q%' search, no B-tree can serve it
+    "SELECT id, uploaded_at FROM files ORDER BY uploaded_at, id",   # tag bitmap build
+    "SELECT file_id, tag_id FROM file_tags",                        # tag bitmap build
+}
+
+# Row sources that are not stored tables: recursive CTE queues and per-request temp tables
+NON_TABLE_SOURCES = {"s", "subtree", "bulk_targets", "folder_subtree"}
+
+def exercise_routes(client, library):
+    tags, folders, files = library["tags"], library["folders"], library["files"]
+    warm_tag_bitmaps()
+
+    client.get("/api/tags")
+    client.get("/api/tags?q=ba")
+    client.get("/api/tags?category=composer")
+    client.get("/api/folders/tree")
+    client.get(f"/api/folders/{folders['scores']}/descendants")
+    client.get("/api/folders/search?q=roma")
+
+    client.get(f"/api/files?tag_ids={tags['bach']}")
+    client.get(f"/api/files?folder_ids={folders['baroque']}")
+    client.get(f"/api/files?folder_ids={folders['baroque']},{folders['scores']}&size=1")
+    client.get(f"/api/files?tag_ids={tags['piano']}&folder_ids={folders['romantic']}&facets=category")
+    client.get(f"/api/files?tag_ids={tags['bach']},{tags['piano']}&folder_ids={folders['baroque']}&size=1&page=2")
+    client.get(f"/api/files?tag_ids={tags['bach']}&folder_ids={folders['scores']}&recursive=true&facets=category")
+    client.get(f"/api/files?folder_ids={folders['inbox']}&facets=category")
+    client.get(f"/api/files/{files['prelude.pdf']}")
+    client.get(f"/api/files/search?q=prelude&tag_ids={tags['bach']}&folder_ids={folders['baroque']}")
+
+    client.put(f"/api/files/{files['fugue.pdf']}", json={"tags": [tags["bach"]], "folders": [folders["inbox"]]})
+    client.post("/api/files/bulk/relations", json={
+        "filter": {"tag_ids": [tags["chopin"]], "folder_ids": [folders["romantic"]]},
+        "add_tags": [tags["violin"]],
+        "remove_folders": [folders["inbox"]],
+    })
+    client.post(f"/api/tags/{tags['bach']}/alias", json={"alias": "JS Bach"})
+    client.delete(f"/api/files/{files['sketch.pdf']}")
+    client.delete(f"/api/folders/{folders['scores']}")
+    client.get(f"/api/files?tag_ids={tags['piano']}&facets=category")  # Replays the writes into the tag bitmaps
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def full_scans(plan):
+    scans = []
+    for line in plan:
+        match = re.match(r"SCAN (\w+)", line)
+        if match and match.group(1) not in NON_TABLE_SOURCES and "VIRTUAL TABLE" not in line:
+            scans.append(line)
+    return scans
+
+def test_route_queries_use_indexes(client, library, monkeypatch):
+    statements = {}
+
+    def capture(sql, params, seconds, rows):
+        # Keep the first run that has a parameter set (executemany may get an empty list or an iterator)
+        if isinstance(params, (list, tuple)) and params and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        elif not isinstance(params, (list, tuple, dict)):
+            return
+        sql = " ".join(sql.split())
+        if sql.count("?") == len(params):
+            statements.setdefault(sql, params)
+
+    monkeypatch.setattr(database, "QUERY_LISTENERS", [capture])
+    exercise_routes(client, library)
+    monkeypatch.setattr(database, "QUERY_LISTENERS", [])
+    assert len(statements) > 40
+
+    conn = database._get_connection()
+    offenders = []
+    for sql, params in statements.items():
+        if sql in WHOLE_TABLE_READS:
+            continue
+        scans = full_scans(explain(conn, sql, params))
+        if scans:
+            offenders.append(f"{sql}\n    {scans}")
+
+    assert not offenders, "Full table scans:\n" + "\n".join(offenders)
+
+def test_folder_filters_are_driven_by_the_folder_index(client, library):
+    # Regression: a correlated EXISTS per folder made SQLite walk every file in date order
+    from routes.files import build_file_filter
+
+    tags, folders = library["tags"], library["folders"]
+    conn = database._get_connection()
+    for tag_ids, folder_ids in (([], [folders["baroque"]]), ([tags["bach"]], [folders["baroque"]])):
+        where_sql, params = build_file_filter(tag_ids, folder_ids)
+        for sql, sql_params in (
+            (f"SELECT * FROM files f {where_sql} ORDER BY f.uploaded_at DESC, f.id DESC LIMIT ?", params + [20]),
+            (f"SELECT COUNT(*) FROM files f {where_sql}", params),
+        ):
+            plan = explain(conn, sql, sql_params)
+            assert not full_scans(plan), plan
+            assert any("idx_file_folders_folder" in line for line in plan), plan
+
+def test_large_folder_pages_walk_the_date_index(client, library, monkeypatch):
+    # Regression: loading a 100k-file folder and sorting it cost ~200 ms on every page
+    import routes.files
+    from routes.files import build_file_filter, is_dense_filter
+
+    tags, folders = library["tags"], library["folders"]
+    monkeypatch.setattr(routes.files, "DENSE_SET_FILES", 1)  # baroque (2 files) counts as large, scores (1) not
+    conn = database._get_connection()
+    cursor = conn.cursor()
+    assert is_dense_filter(cursor, [tags["bach"]], [folders["baroque"]])
+    assert not is_dense_filter(cursor, [tags["bach"]], [folders["scores"]])
+    assert is_dense_filter(cursor, [], [folders["scores"]], recursive=True)
+
+    for tag_ids, folder_ids, recursive in (
+        ([], [folders["baroque"]], False),
+        ([tags["bach"]], [folders["baroque"]], False),
+        ([tags["piano"]], [folders["scores"]], True),
+    ):
+        where_sql, params = build_file_filter(tag_ids, folder_ids, recursive=recursive, walk_by_date=True)
+        sql = f"SELECT * FROM files f {where_sql} AND (f.uploaded_at, f.id) < (?, ?) ORDER BY f.uploaded_at DESC, f.id DESC LIMIT ?"
+        plan = explain(conn, sql, params + ["9999", "", 21])
+        assert any("USING INDEX idx_files_uploaded_at" in line for line in plan), plan
+        assert not any("TEMP B-TREE" in line for line in plan), plan
+
+        # Same pages either way
+        query = f"tag_ids={','.join(map(str, tag_ids))}&folder_ids={','.join(folder_ids)}&recursive={str(recursive).lower()}&size=1"
+        walked = [client.get(f"/api/files?{query}&page={n}").get_json()["data"] for n in (1, 2, 3)]
+        monkeypatch.setattr(routes.files, "DENSE_SET_FILES", 1000)
+        loaded = [client.get(f"/api/files?{query}&page={n}").get_json()["data"] for n in (1, 2, 3)]
+        monkeypatch.setattr(routes.files, "DENSE_SET_FILES", 1)
+        assert walked[0]["files"] and walked == loaded
+    cursor.close()
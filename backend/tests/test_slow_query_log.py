@@ -0,0 +1,27 @@
+import os
+import database
+from database import enable_slow_query_log, slow_query_log_path
+
+def test_each_process_writes_its_own_slow_query_log(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "QUERY_LISTENERS", [])
+    path = str(tmp_path / "slow_queries.log")
+    enable_slow_query_log(0, path)
+    try:
+        client.get("/api/tags")
+        own = slow_query_log_path(path, os.getpid())
+        assert own == str(tmp_path / f"slow_queries.{os.getpid()}.log")
+        with open(own, encoding="utf-8") as f:
+            assert "SELECT * FROM tags" in f.read()
+
+        # A forked worker inherits the parent's handler but opens a file of its own
+        monkeypatch.setattr(os, "getpid", lambda: 424242)
+        with database.get_db() as (conn, cursor):
+            cursor.execute("SELECT COUNT(*) FROM files")
+        with open(str(tmp_path / "slow_queries.424242.log"), encoding="utf-8") as f:
+            assert "SELECT COUNT(*) FROM files" in f.read()
+        assert not os.path.exists(path)
+    finally:
+        for handler in list(database._slow_query_logger.handlers):
+            database._slow_query_logger.removeHandler(handler)
+            handler.close()
+        monkeypatch.setitem(database._slow_query_settings, "seconds", None)
@@ -0,0 +1,139 @@
+import pytest
+import database
+import utils.tag_bitmaps as tag_bitmaps
+from utils.tag_bitmaps import find_files_with_tags, count_tags_with, warm_tag_bitmaps, record_files_changed
+from utils.versions import get_version
+from conftest import upload
+
+def files_with_tags(tag_ids):
+    """The answer find_files_with_tags must give, straight from SQL."""
+    with database.get_db() as (conn, cursor):
+        cursor.execute(f"""
+            SELECT f.id FROM files f
+            WHERE f.id IN (
+                SELECT file_id FROM file_tags WHERE tag_id IN ({','.join('?' * len(tag_ids))})
+                GROUP BY file_id HAVING COUNT(*) = ?
+            )
+            ORDER BY f.uploaded_at DESC, f.id DESC
+        """, list(tag_ids) + [len(tag_ids)])
+        return [row["id"] for row in cursor.fetchall()]
+
+def assert_index_matches(tags):
+    for tag_ids in ([t] for t in tags.values()):
+        expected = files_with_tags(tag_ids)
+        assert find_files_with_tags(tag_ids, limit=100) == (len(expected), expected)
+
+def write_from_another_worker(*statements):
+    """Commit a write without going through this process's routes, then bump like the writer would."""
+    with database.get_db() as (conn, cursor):
+        for sql, params in statements:
+            cursor.execute(sql, params)
+    record_files_changed()
+
+class _NotStarted:
+    def start(self):
+        pass
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    """Collect background rebuilds instead of starting their threads; run them with rebuilds[0]()."""
+    targets = []
+    monkeypatch.setattr(tag_bitmaps.threading, "Thread", lambda target, **kwargs: targets.append(target) or _NotStarted())
+    return targets
+
+def test_replays_the_log_instead_of_rebuilding(client, library, monkeypatch):
+    tags, files = library["tags"], library["files"]
+    warm_tag_bitmaps()
+    monkeypatch.setattr(tag_bitmaps, "_build_index", lambda: pytest.fail("index was rebuilt instead of caught up"))
+
+    write_from_another_worker(
+        ("DELETE FROM file_tags WHERE file_id = ? AND tag_id = ?", (files["prelude.pdf"], tags["piano"])),
+        ("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (files["sketch.pdf"], tags["violin"])),
+    )
+    assert_index_matches(tags)
+
+    # Through the routes of this worker: tag edits, a new file, a deletion, a deleted tag
+    client.put(f"/api/files/{files['nocturne.pdf']}", json={"tags": [tags["bach"]], "folders": []})
+    upload(client, "toccata.pdf", tags=[tags["bach"], tags["piano"]])
+    client.delete(f"/api/files/{files['partita.pdf']}")
+    client.delete(f"/api/tags/{tags['chopin']}")
+    tags.pop("chopin")
+    assert_index_matches(tags)
+    assert count_tags_with([tags["bach"]]) == {str(tags["piano"]): 2}
+
+def test_file_sorting_before_indexed_files(library, monkeypatch):
+    tags, files = library["tags"], library["files"]
+    warm_tag_bitmaps()
+    monkeypatch.setattr(tag_bitmaps, "_build_index", lambda: pytest.fail("index was rebuilt instead of caught up"))
+
+    # Uploaded by another worker in the same instant, or imported with an old date
+    write_from_another_worker(
+        ("INSERT INTO files (id, name, upload_path, size, uploaded_at) VALUES ('old', 'old.pdf', 'old.pdf', 1, '2000-01-01')", ()),
+        ("INSERT INTO file_tags (file_id, tag_id) VALUES ('old', ?)", (tags["bach"],)),
+        ("INSERT INTO file_tags (file_id, tag_id) VALUES ('old', ?)", (tags["piano"],)),
+    )
+    assert_index_matches(tags)
+    total, ids = find_files_with_tags([tags["bach"], tags["piano"]], limit=100)
+    assert ids[-1] == "old"
+
+    write_from_another_worker(("DELETE FROM file_tags WHERE file_id = ? AND tag_id = ?", (files["fugue.pdf"], tags["bach"])))
+    assert_index_matches(tags)
+
+def test_rebuilds_in_the_background_when_too_far_behind(client, library, rebuilds, monkeypatch):
+    tags, files = library["tags"], library["files"]
+    warm_tag_bitmaps()
+    monkeypatch.setattr(tag_bitmaps, "CATCH_UP_LIMIT", 2)
+
+    write_from_another_worker(
+        ("DELETE FROM file_tags WHERE tag_id = ?", (tags["piano"],)),
+    )
+
+    # Answered from SQL while the index is being rebuilt
+    assert find_files_with_tags([tags["bach"]], limit=10) is None
+    response = client.get(f"/api/files?tag_ids={tags['bach']}&facets=category")
+    data = response.get_json()["data"]
+    assert data["total"] == 3
+    assert [tag["name"] for tag in data["facets"]["instrument"]] == ["violin"]
+    assert len(rebuilds) == 1  # A single rebuild, however many queries arrive meanwhile
+
+    rebuilds[0]()
+    assert_index_matches(tags)
+
+def test_rebuilds_when_the_log_was_pruned(library, rebuilds):
+    tags, files = library["tags"], library["files"]
+    warm_tag_bitmaps()
+    write_from_another_worker(
+        ("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (files["sketch.pdf"], tags["bach"])),
+        ("DELETE FROM tag_index_log", ()),
+        ("INSERT INTO file_tags (file_id, tag_id) VALUES (?, ?)", (files["sketch.pdf"], tags["piano"])),
+    )
+    assert find_files_with_tags([tags["bach"]], limit=10) is None
+    rebuilds[0]()
+    assert_index_matches(tags)
+
+def test_folder_only_writes_leave_the_index_alone(client, library):
+    tags, folders, files = library["tags"], library["folders"], library["files"]
+    before = get_version("files")
+
+    client.put(f"/api/files/{files['prelude.pdf']}", json={"tags": [tags["bach"], tags["piano"]], "folders": [folders["inbox"]]})
+    client.post("/api/files/bulk/relations", json={"file_ids": [files["fugue.pdf"]], "add_folders": [folders["inbox"]]})
+    client.delete(f"/api/folders/{folders['scores']}")
+    assert get_version("files") == before
+
+    client.put(f"/api/files/{files['prelude.pdf']}", json={"tags": [tags["bach"]], "folders": []})
+    assert get_version("files") == before + 1
+
+def test_repeated_tag_ids_give_the_same_answer_on_every_path(client, library, monkeypatch):
+    tags, folders = library["tags"], library["folders"]
+    bach = tags["bach"]
+
+    def total(query):
+        return client.get(f"/api/files?{query}").get_json()["data"]["total"]
+
+    warm_tag_bitmaps()
+    assert total(f"tag_ids={bach},{bach}") == 3
+    assert total(f"tag_ids={bach},{bach}&folder_ids={folders['baroque']}") == 2
+
+    # SQL answers while the index is being rebuilt
+    monkeypatch.setattr(tag_bitmaps, "_state", {"index": None, "building": True})
+    assert total(f"tag_ids={bach},{bach}") == 3
@@ -0,0 +1,151 @@
+import io
+import os
+import time
+import hashlib
+import threading
+import database
+import routes.uploads
+from routes.uploads import expire_upload_sessions, PARTIAL_DIR
+
+class StalledBody(io.RawIOBase):
+    """Request body that sends one block, then hangs until released and fails like a dropped connection."""
+
+    def __init__(self, first_block, length):
+        self.first_block = first_block
+        self.length = length  # Announced as Content-Length
+        self.position = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def readable(self):
+        return True
+
+    # The test client measures the body by seeking to its end and back
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        self.position = self.length if whence == 2 else offset
+        return self.position
+
+    def readinto(self, buffer):
+        if self.first_block:
+            n = len(self.first_block)
+            buffer[:n], self.first_block = self.first_block, b""
+            self.started.set()
+            return n
+        self.release.wait(5)
+        raise OSError("connection reset by peer")
+
+def start_upload(client, **body):
+    response = client.post("/api/files/uploads", json={"name": "score.pdf", **body})
+    assert response.status_code == 201
+    return response.get_json()["data"]["upload_id"]
+
+def test_chunked_upload_round_trip(client):
+    upload_id = start_upload(client, size=10)
+    assert client.put(f"/api/files/uploads/{upload_id}?offset=0", data=b"%PDF-").status_code == 200
+    assert client.put(f"/api/files/uploads/{upload_id}?offset=0", data=b"again").status_code == 409
+    assert client.put(f"/api/files/uploads/{upload_id}?offset=5", data=b"1.4 x").status_code == 200
+
+    response = client.post(f"/api/files/uploads/{upload_id}/complete")
+    assert response.status_code == 201
+    assert response.get_json()["data"]["sha256"] == hashlib.sha256(b"%PDF-1.4 x").hexdigest()
+
+def test_retry_while_a_chunk_is_in_flight(client):
+    # A client retries after a dropped connection while the server still reads the first attempt
+    upload_id = start_upload(client)
+    url = f"/api/files/uploads/{upload_id}?offset=0"
+    stalled = StalledBody(b"A" * 1000, length=4000)
+    first = {}
+    thread = threading.Thread(target=lambda: first.setdefault("response", client.put(url, input_stream=stalled)))
+    thread.start()
+    assert stalled.started.wait(5)
+
+    retry = client.put(url, data=b"B" * 3000)
+    assert retry.status_code == 409  # The upload is locked by the first attempt
+
+    stalled.release.set()
+    thread.join(5)
+    assert first["response"].status_code == 400
+
+    retry = client.put(url, data=b"B" * 3000)
+    assert retry.status_code == 200
+    assert retry.get_json()["data"]["offset"] == 3000
+
+    response = client.post(f"/api/files/uploads/{upload_id}/complete")
+    assert response.status_code == 201
+    data = response.get_json()["data"]
+    assert data["size"] == 3000
+    assert data["sha256"] == hashlib.sha256(b"B" * 3000).hexdigest()
+
+    content = client.get(f"/api/files/{data['file_id']}/content")
+    assert content.data == b"B" * 3000
+
+def test_complete_rejects_data_shorter_than_acknowledged(client):
+    upload_id = start_upload(client)
+    client.put(f"/api/files/uploads/{upload_id}?offset=0", data=b"0123456789")
+    with open(os.path.join(PARTIAL_DIR, f"{upload_id}.part"), "r+b") as f:
+        f.truncate(4)
+
+    response = client.post(f"/api/files/uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert client.get(f"/api/files/uploads/{upload_id}").get_json()["data"]["offset"] == 4
+
+    client.put(f"/api/files/uploads/{upload_id}?offset=4", data=b"456789")
+    response = client.post(f"/api/files/uploads/{upload_id}/complete")
+    assert response.get_json()["data"]["sha256"] == hashlib.sha256(b"0123456789").hexdigest()
+
+def test_expire_upload_sessions(client):
+    idle = start_upload(client)
+    active = start_upload(client)
+    client.put(f"/api/files/uploads/{idle}?offset=0", data=b"abc")
+    client.put(f"/api/files/uploads/{active}?offset=0", data=b"abc")
+
+    stray = os.path.join(PARTIAL_DIR, "no-session.part")
+    open(stray, "wb").close()
+
+    # Make everything look two days old, then let one upload receive a chunk
+    two_days_ago = time.time() - 2 * 86400
+    with database.get_db() as (conn, cursor):
+        cursor.execute("UPDATE upload_sessions SET created_at = datetime(?, 'unixepoch')", (two_days_ago,))
+    for name in (f"{idle}.part", f"{active}.part", "no-session.part"):
+        os.utime(os.path.join(PARTIAL_DIR, name), (two_days_ago, two_days_ago))
+    client.put(f"/api/files/uploads/{active}?offset=3", data=b"def")
+
+    assert expire_upload_sessions(ttl=86400) == 2
+    assert client.get(f"/api/files/uploads/{idle}").status_code == 404
+    assert not os.path.exists(os.path.join(PARTIAL_DIR, f"{idle}.part"))
+    assert not os.path.exists(stray)
+    assert client.get(f"/api/files/uploads/{active}").get_json()["data"]["offset"] == 6
+
+def test_init_upload_expires_sessions_periodically(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(routes.uploads, "expire_upload_sessions", lambda now: calls.append(now))
+    monkeypatch.setitem(routes.uploads._last_expiry, "at", 0.0)
+    start_upload(client)
+    start_upload(client)
+    assert len(calls) == 1
+
+def test_init_upload_validates_tags_and_folders(client, library):
+    for body, message in (
+        ({"tags": [{"x": 1}]}, "tags and folders must be arrays of ids"),
+        ({"tags": [999]}, "Tag ID not found: 999"),
+        ({"folders": ["nowhere"]}, "Folder ID not found: nowhere"),
+    ):
+        response = client.post("/api/files/uploads", json={"name": "score.pdf", **body})
+        assert response.status_code == 400
+        assert response.get_json()["error"] == message
+
+def test_complete_after_a_tag_was_deleted(client, library):
+    tags = library["tags"]
+    upload_id = start_upload(client, tags=[tags["bach"], tags["violin"]])
+    client.put(f"/api/files/uploads/{upload_id}?offset=0", data=b"%PDF-1.4 x")
+    assert client.delete(f"/api/tags/{tags['violin']}").status_code == 200
+
+    response = client.post(f"/api/files/uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert response.get_json()["error"] == f"Tag ID not found: {tags['violin']}"
+    # The received data is kept
+    assert client.get(f"/api/files/uploads/{upload_id}").get_json()["data"]["offset"] == 10
+    assert os.path.getsize(os.path.join(PARTIAL_DIR, f"{upload_id}.part")) == 10
@@ -0,0 +1,88 @@
+import os
+import json
+from flask import current_app
+from config import BASE_DIR
+
+'''
+API documentation (Swagger UI and the OpenAPI spec), in one of three modes
+chosen by the API_DOCS setting (see config.py):
+
+    "live"   - flasgger builds the spec from the YAML in the route docstrings
+               (handy while editing routes; every worker parses them once)
+    "static" - serve the spec prebuilt by `python build_openapi.py` from
+               openapi.json; flasgger is not even imported
+    "off"    - no documentation routes
+
+Both modes serve the spec at /apispec_1.json and the UI at /apidocs/.
+'''
+
+STATIC_SPEC_PATH = os.path.join(BASE_DIR, "openapi.json")
+SPEC_ROUTE = "/apispec_1.json"
+DOCS_ROUTE = "/apidocs/"
+SWAGGER_UI_URL = "https://unpkg.com/swagger-ui-dist@5"
+
+DOCS_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>API docs</title>
+  <link rel="stylesheet" href="{ui}/swagger-ui.css">
+</head>
+<body>
+  <div id="swagger-ui"></div>
+  <script src="{ui}/swagger-ui-bundle.js"></script>
+  <script>SwaggerUIBundle({{url: "{spec}", dom_id: "#swagger-ui"}});</script>
+</body>
+</html>
+"""
+
+def init_api_docs(app, mode):
+    """
+    Register the documentation routes for the given mode.
+
+    A missing flasgger (live) or openapi.json (static) only disables the docs,
+    with a warning; the API itself is unaffected.
+    """
+    if mode == "live":
+        try:
+            from flasgger import Swagger  # Imported here so other modes never load it
+        except ImportError:
+            app.logger.warning("API docs disabled: flasgger is not installed (pip install flasgger)")
+            return
+        Swagger(app)
+
+    elif mode == "static":
+        if not os.path.exists(STATIC_SPEC_PATH):
+            app.logger.warning(f"API docs disabled: {STATIC_SPEC_PATH} not found, run python build_openapi.py")
+            return
+        with open(STATIC_SPEC_PATH, "rb") as f:
+            spec = f.read()
+        page = DOCS_PAGE.format(ui=SWAGGER_UI_URL, spec=SPEC_ROUTE)
+
+        app.add_url_rule(
+            SPEC_ROUTE, "apispec",
+            lambda: current_app.response_class(spec, mimetype="application/json")
+        )
+        app.add_url_rule(
+            DOCS_ROUTE, "apidocs",
+            lambda: current_app.response_class(page, mimetype="text/html")
+        )
+
+    elif mode != "off":
+        raise ValueError(f"API_DOCS must be live, static or off, got {mode!r}")
+
+def build_static_spec(app, path=STATIC_SPEC_PATH):
+    """
+    Generate the OpenAPI spec of an app's routes with flasgger and write it to path.
+
+    Returns:
+        dict: The spec that was written.
+    """
+    from flasgger import Swagger
+
+    swagger = Swagger(app)
+    with app.test_request_context():
+        spec = swagger.get_apispecs()
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False, sort_keys=True, indent=1)
+    return spec
@@ -0,0 +1,20 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+'''
+Shared process pool for CPU-heavy work that must stay off the request path
+(thumbnail rendering, PDF text extraction).
+'''
+
+BACKGROUND_WORKERS = 2
+
+_executor = None
+_lock = threading.Lock()
+
+def get_process_pool():
+    """Return the process pool, creating it on first use."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=BACKGROUND_WORKERS)
+        return _executor
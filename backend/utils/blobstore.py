@@ -0,0 +1,167 @@
+import os
+import hashlib
+import tempfile
+from config import BASE_DIR, settings
+from database import get_db
+
+'''
+Content-addressed storage for uploaded files.
+
+Every distinct file content is stored once, at uploads/blobs/ab/cd/<sha256>.pdf,
+and tracked in the *blobs* table:
+
+*blobs*
+    sha256 (primary key)
+    path (relative to UPLOAD_DIR, like files.upload_path)
+    size
+    ref_count (number of files rows pointing at this blob)
+
+Uploading content that already exists only bumps ref_count; the blob is
+unlinked when the last file referencing it is deleted.
+
+Uploads check for an existing blob before deciding whether to keep the
+content, in an earlier transaction than the one taking the reference. If the
+last reference is released in between, add_blob_ref raises BlobMissing and the
+upload stores its content and tries again.
+'''
+
+UPLOAD_DIR = settings["UPLOAD_DIR"]  # Absolute, see config.py
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TEMP_DIR = os.path.join(BLOB_DIR, ".tmp")
+
+HASH_BLOCK_SIZE = 64 * 1024
+
+class BlobMissing(ValueError):
+    """The blob is not stored (any more) and the caller did not provide its content."""
+
+def resolve_path(path):
+    """
+    Return the absolute location of a stored path (files.upload_path, blobs.path).
+
+    Stored paths are relative to UPLOAD_DIR, so the upload folder can be moved
+    without touching the database; absolute paths are returned unchanged.
+    """
+    return path if os.path.isabs(path) else os.path.join(UPLOAD_DIR, path)
+
+def legacy_path(path):
+    """Resolve a path stored before m009, when relative paths were relative to the backend folder."""
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+def blob_path(sha256):
+    """Return the stored path (relative to UPLOAD_DIR) of the blob with the given hex digest."""
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+
+def hash_stream(stream):
+    """
+    Compute the SHA-256 and size of a readable binary stream in fixed-size blocks.
+
+    Returns:
+        tuple: (hex digest, size in bytes)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        block = stream.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        hasher.update(block)
+        size += len(block)
+    return hasher.hexdigest(), size
+
+def hash_file(path):
+    """Compute the SHA-256 and size of a file on disk."""
+    with open(path, "rb") as f:
+        return hash_stream(f)
+
+def save_to_temp(stream):
+    """Copy a binary stream into a new temp file next to the blobs and return its path."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TEMP_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = stream.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+def blob_exists(cursor, sha256):
+    """Return True if a blob with this digest is already stored."""
+    cursor.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,))
+    return cursor.fetchone() is not None
+
+def add_blob_ref(cursor, sha256, size, temp_path=None):
+    """
+    Take a reference on the blob with the given digest, storing it from temp_path if it is new.
+
+    Must run inside the transaction that inserts the referencing files row. The
+    first UPDATE takes SQLite's write lock, so concurrent uploads of the same
+    new content cannot both store it.
+
+    Args:
+        cursor: Cursor of the caller's transaction.
+        sha256 (str): Hex digest of the content.
+        size (int): Content size in bytes.
+        temp_path (str, optional): File holding the content. Moved into place if the
+            blob is new; left alone otherwise (the caller removes it after commit).
+
+    Returns:
+        tuple: (blob path as stored, True if this call stored the blob)
+
+    Raises:
+        BlobMissing: If the blob is new but no temp_path was given (the transaction
+            is left as it was).
+    """
+    path = blob_path(sha256)
+    cursor.execute("UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = ?", (sha256,))
+    if cursor.rowcount:
+        return path, False
+
+    # Nothing written yet: a caller that gets BlobMissing can store the content and call again
+    if not temp_path:
+        raise BlobMissing(f"Content for blob {sha256} is not available")
+    cursor.execute("INSERT INTO blobs (sha256, path, size, ref_count) VALUES (?, ?, ?, 1)", (sha256, path, size))
+    os.makedirs(os.path.dirname(resolve_path(path)), exist_ok=True)
+    os.replace(temp_path, resolve_path(path))
+    return path, True
+
+def release_blob_ref(cursor, sha256):
+    """
+    Drop a reference on a blob.
+
+    Returns:
+        str or None: Path of the blob if this was the last reference (the caller
+        unlinks it after commit), otherwise None.
+    """
+    cursor.execute("UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = ?", (sha256,))
+    cursor.execute("SELECT path, ref_count FROM blobs WHERE sha256 = ?", (sha256,))
+    row = cursor.fetchone()
+    if not row or row["ref_count"] > 0:
+        return None
+    cursor.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+    return resolve_path(row["path"])
+
+def remove_released_blob(sha256, path):
+    """
+    Unlink a blob whose last reference was released, after that transaction committed.
+
+    An upload of the same content may have stored the blob again at the same
+    path in the meantime; the blobs row is re-checked under the write lock
+    (which add_blob_ref also holds while it moves content into place), and the
+    file is only unlinked if the row is still gone.
+
+    Returns:
+        bool: True if the file was removed.
+    """
+    with get_db() as (conn, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+        if blob_exists(cursor, sha256):
+            return False
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+    return False
@@ -0,0 +1,74 @@
+from database import chunked
+
+'''
+*folder_paths* (closure table, one row per ancestor/descendant pair)
+    ancestor_id
+    descendant_id
+    depth (0 = the folder itself, 1 = parent, ...)
+
+Every folder has a depth-0 row pointing at itself, so a folder's full path is
+simply its ancestors ordered by depth, and its subtree is every row with
+ancestor_id = folder.
+'''
+
+def add_folder_path(cursor, folder_id, parent_id=None):
+    """
+    Register a newly inserted folder in the closure table.
+
+    Args:
+        cursor: Cursor of the transaction that inserted the folder.
+        folder_id (str): ID of the new folder.
+        parent_id (str, optional): ID of its parent, None for a root folder.
+    """
+    cursor.execute(
+        "INSERT INTO folder_paths (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)",
+        (folder_id, folder_id)
+    )
+    if parent_id:
+        cursor.execute("""
+            INSERT INTO folder_paths (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, ?, depth + 1
+            FROM folder_paths
+            WHERE descendant_id = ?
+        """, (folder_id, parent_id))
+
+def get_full_paths(cursor, folder_ids):
+    """
+    Look up the full paths of several folders at once.
+
+    Returns:
+        dict: folder_id -> list of folder names from the root down to the folder itself.
+
+    Example:
+        >>> get_full_paths(cursor, ["<id of 1月>"])
+        {"<id of 1月>": ["2024", "1月"]}
+    """
+    paths = {}
+    for batch in chunked(folder_ids):
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"""
+            SELECT fp.descendant_id, f.name
+            FROM folder_paths fp
+            JOIN folders f ON f.id = fp.ancestor_id
+            WHERE fp.descendant_id IN ({placeholders})
+            ORDER BY fp.descendant_id, fp.depth DESC
+        """, batch)
+        for row in cursor.fetchall():
+            paths.setdefault(row["descendant_id"], []).append(row["name"])
+    return paths
+
+def rebuild_folder_paths(cursor):
+    """Recompute the whole closure table from folders.parent_id."""
+    cursor.execute("DELETE FROM folder_paths")
+    cursor.execute("""
+        WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM folders
+            UNION ALL
+            SELECT f.parent_id, p.descendant_id, p.depth + 1
+            FROM paths p
+            JOIN folders f ON f.id = p.ancestor_id
+            JOIN folders parent ON parent.id = f.parent_id
+        )
+        INSERT INTO folder_paths (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM paths
+    """)
@@ -0,0 +1,61 @@
+import threading
+from flask import request, current_app
+from utils.response import success
+from utils.versions import get_epoch, get_version
+
+'''
+Conditional GET for responses that depend only on some data versions
+(see utils/versions.py).
+
+The ETag is built from the version counters alone, so a client revalidating
+with If-None-Match gets its 304 without a database query. Responses can also
+keep their serialized body in memory, reused until one of the versions moves.
+'''
+
+CACHE_CONTROL = "no-cache"  # Clients may store responses but must revalidate them
+
+_body_cache = {}  # cache key -> (etag, serialized body)
+_lock = threading.Lock()
+
+def version_etag(names):
+    """Return the strong ETag (unquoted) for the current values of the given version names."""
+    return "-".join(str(v) for v in (get_epoch(), *(get_version(name) for name in names)))
+
+def _with_validators(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+def versioned_response(names, build, cache_key=None):
+    """
+    Serve a GET whose payload only changes when one of the named versions is bumped.
+
+    Args:
+        names (tuple): Version names the payload depends on, e.g. ("folders",).
+        build (callable): Returns the payload for success(); only called when needed.
+        cache_key (str, optional): Keep the serialized body in memory under this key.
+            Leave out for responses that vary with the query string.
+
+    Returns:
+        Response: 304 if the client's If-None-Match is current, otherwise the
+        standard success response, both carrying the ETag.
+
+    Example:
+        >>> return versioned_response(("folders",), build_folder_tree, cache_key="folder_tree")
+    """
+    # Take the ETag before building, so a write committed meanwhile is seen on the next request
+    etag = version_etag(names)
+    if request.if_none_match.contains(etag):
+        return _with_validators(current_app.response_class(status=304), etag)
+
+    with _lock:
+        cached = _body_cache.get(cache_key) if cache_key else None
+    if cached and cached[0] == etag:
+        response = current_app.response_class(cached[1], mimetype="application/json")
+        return _with_validators(response, etag)
+
+    response, code = success(build())
+    if cache_key:
+        with _lock:
+            _body_cache[cache_key] = (etag, response.get_data())
+    return _with_validators(response, etag)
@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from flask import request
+import database
+
+'''
+Per-route request metrics in the Prometheus text format (GET /api/metrics).
+
+Enabled with METRICS=on (see config.py). For every request it records:
+    - latency, as a histogram per route and method
+    - requests, per route, method and status code
+    - SQL statements issued (counted by the sqlite3 trace callback, so each
+      executemany row and trigger statement counts), as a histogram
+    - rows fetched and time spent in SQLite (execute plus fetching, through
+      the instrumented cursors of database.py)
+
+With METRICS=off nothing is installed: no request hooks, no trace callback,
+plain cursors.
+
+Each worker process keeps its own numbers and labels them with worker="<pid>";
+sum over that label in queries.
+'''
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_lock = threading.Lock()
+_routes = {}    # (route, method) -> aggregated numbers, see _route_stats
+_statuses = {}  # (route, method, status) -> request count
+_current = threading.local()  # .stats of the request being handled by this thread
+
+def _route_stats(key):
+    stats = _routes.get(key)
+    if stats is None:
+        stats = _routes[key] = {
+            "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            "latency_sum": 0.0,
+            "statement_buckets": [0] * (len(STATEMENT_BUCKETS) + 1),
+            "statement_sum": 0,
+            "rows": 0,
+            "db_seconds": 0.0,
+            "count": 0,
+        }
+    return stats
+
+def _count_statement(statement):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats["statements"] += 1
+
+def _record_query(sql, parameters, seconds, rows):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats["db_seconds"] += seconds
+        stats["rows"] += rows
+
+def _start_request():
+    _current.stats = {"started": time.perf_counter(), "statements": 0, "rows": 0, "db_seconds": 0.0, "status": 500}
+
+def _note_status(response):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats["status"] = response.status_code
+    return response
+
+def _finish_request(exc=None):
+    # Teardown runs after a streamed body has been sent, so streams are measured in full
+    stats = getattr(_current, "stats", None)
+    _current.stats = None
+    if stats is None:
+        return
+
+    latency = time.perf_counter() - stats["started"]
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    key = (route, request.method)
+    with _lock:
+        aggregate = _route_stats(key)
+        aggregate["count"] += 1
+        aggregate["latency_buckets"][bisect_left(LATENCY_BUCKETS, latency)] += 1
+        aggregate["latency_sum"] += latency
+        aggregate["statement_buckets"][bisect_left(STATEMENT_BUCKETS, stats["statements"])] += 1
+        aggregate["statement_sum"] += stats["statements"]
+        aggregate["rows"] += stats["rows"]
+        aggregate["db_seconds"] += stats["db_seconds"]
+        status_key = key + (stats["status"],)
+        _statuses[status_key] = _statuses.get(status_key, 0) + 1
+
+def metrics_enabled():
+    """Return True if init_metrics() has installed the hooks in this process."""
+    return _record_query in database.QUERY_LISTENERS
+
+def init_metrics(app, mode="on"):
+    """
+    Start collecting metrics for every request handled by app ("on"), or do nothing ("off").
+
+    Call before serving; connections opened earlier by this thread are reopened
+    so they carry the trace callback.
+    """
+    if mode == "off":
+        return
+    if mode != "on":
+        raise ValueError(f"METRICS must be on or off, got {mode!r}")
+
+    if not metrics_enabled():
+        database.QUERY_LISTENERS.append(_record_query)
+        database.TRACE_CALLBACKS.append(_count_statement)
+        database.close_db()
+
+    app.before_request(_start_request)
+    app.after_request(_note_status)
+    app.teardown_request(_finish_request)
+
+def _labels(**labels):
+    escaped = (
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _histogram(lines, name, bounds, buckets, total, count, **labels):
+    cumulative = 0
+    for bound, bucket in zip(list(bounds) + ["+Inf"], buckets):
+        cumulative += bucket
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total}")
+    lines.append(f"{name}_count{_labels(**labels)} {count}")
+
+def render_metrics():
+    """
+    Render this process's metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition, one sample per line.
+    """
+    worker = os.getpid()
+    with _lock:
+        routes = {key: dict(stats) for key, stats in _routes.items()}
+        statuses = dict(_statuses)
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (route, method), stats in sorted(routes.items()):
+        _histogram(lines, "http_request_duration_seconds", LATENCY_BUCKETS, stats["latency_buckets"],
+                   stats["latency_sum"], stats["count"], route=route, method=method, worker=worker)
+
+    lines += [
+        "# HELP http_requests_total Requests by route and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append(f"http_requests_total{_labels(route=route, method=method, status=status, worker=worker)} {count}")
+
+    lines += [
+        "# HELP db_statements_per_request SQL statements executed per request.",
+        "# TYPE db_statements_per_request histogram",
+    ]
+    for (route, method), stats in sorted(routes.items()):
+        _histogram(lines, "db_statements_per_request", STATEMENT_BUCKETS, stats["statement_buckets"],
+                   stats["statement_sum"], stats["count"], route=route, method=method, worker=worker)
+
+    lines += [
+        "# HELP db_rows_fetched_total Rows fetched from SQLite.",
+        "# TYPE db_rows_fetched_total counter",
+    ]
+    for (route, method), stats in sorted(routes.items()):
+        lines.append(f"db_rows_fetched_total{_labels(route=route, method=method, worker=worker)} {stats['rows']}")
+
+    lines += [
+        "# HELP db_time_seconds_total Time spent executing statements and fetching rows.",
+        "# TYPE db_time_seconds_total counter",
+    ]
+    for (route, method), stats in sorted(routes.items()):
+        lines.append(f"db_time_seconds_total{_labels(route=route, method=method, worker=worker)} {stats['db_seconds']}")
+
+    return "\n".join(lines) + "\n"
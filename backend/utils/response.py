@@ -1,4 +1,26 @@
-from flask import jsonify
+from flask import jsonify, request, current_app, Response, stream_with_context
+
+try:
+    import orjson  # Optional: several times faster than the stdlib encoder (pip install orjson)
+except ImportError:
+    orjson = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+def dumps(data) -> bytes:
+    """
+    Serialize data to compact JSON bytes, with keys sorted like jsonify does.
+
+    Uses orjson when it is installed, the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return current_app.json.dumps(data).encode("utf-8")
+
+def _json_response(payload, code):
+    if orjson is None:
+        return jsonify(payload), code
+    return current_app.response_class(dumps(payload), mimetype="application/json"), code
 
 def success(data: dict, code=200):
     """
@@ -15,12 +37,12 @@ def success(data: dict, code=200):
         >>> from utils.response import success
         >>> response = success({"id": 123})
     """
-    return jsonify({
+    return _json_response({
         "status": "success",
         "code": code,
         "data": data,
         "error": None
-    }), code
+    }, code)
 
 def error(message: str, code=400):
     """
@@ -37,9 +59,34 @@ def error(message: str, code=400):
         >>> from utils.response import error
         >>> response = error("Invalid input", code=422)
     """
-    return jsonify({
+    return _json_response({
         "status": "error",
         "code": code,
         "data": None,
         "error": message
-    }), code
+    }, code)
+
+def wants_ndjson():
+    """Return True if the client prefers newline-delimited JSON (Accept: application/x-ndjson)."""
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjson_stream(records, code=200):
+    """
+    Create a streaming response with one JSON document per line.
+
+    Args:
+        records (iterable): Objects to send; consumed lazily while the body is written.
+        code (int, optional): HTTP status code. Defaults to 200.
+
+    Returns:
+        Response: A Flask response whose body is generated as it is sent.
+
+    Example:
+        >>> from utils.response import ndjson_stream
+        >>> response = ndjson_stream(({"n": n} for n in range(3)))
+    """
+    def generate():
+        for record in records:
+            yield dumps(record) + b"\n"
+
+    return Response(stream_with_context(generate()), status=code, mimetype=NDJSON_MIMETYPE)
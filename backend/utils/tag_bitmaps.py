@@ -0,0 +1,304 @@
+import threading
+from bisect import bisect_left
+from database import get_db
+from utils.versions import get_epoch, get_version, bump_version
+
+'''
+In-memory bitmap index for tag intersections in list_files.
+
+Every file gets an ordinal: its position in (uploaded_at, id) order, the order
+list_files pages in. Each tag maps to a bitmap (a Python int) with bit n set if
+the file at ordinal n carries the tag. A multi-tag AND is then a few integer
+ANDs, the total is a popcount, and a page is read straight off the highest set
+bits - no GROUP BY over file_tags and no id list sent back to SQLite.
+
+Keeping the index current:
+    - Triggers append every inserted or deleted file and file_tags binding to
+      tag_index_log inside the writing transaction (migration m008), and the
+      writer bumps the "files" version after commit (record_files_changed).
+    - A query that sees a new version replays the log rows its index has not
+      seen yet. Replay reads the current state of each logged file or binding,
+      so it does not matter how many writes a row stands for, or in which
+      worker they happened.
+    - The index is only rebuilt from scratch when it is missing (first use,
+      new version file) or too far behind (CATCH_UP_LIMIT rows, or rows already
+      pruned from the log). The rebuild runs in a background thread; until it
+      is done find_files_with_tags() and count_tags_with() return None and
+      callers answer from SQL. warm_tag_bitmaps() builds synchronously at startup.
+
+Deleted files keep their ordinal until the next rebuild; the `live` bitmap
+masks them out of every query. A file that sorts before existing ones (e.g. two
+uploads in the same second) is inserted by shifting the higher bits up by one.
+'''
+
+# Log rows replayed in place; a worker further behind rebuilds in the background
+CATCH_UP_LIMIT = 10000
+
+_lock = threading.Lock()
+_state = {"index": None, "building": False}
+
+def _build_index():
+    """Load every file and binding into a fresh index."""
+    # Read the version before loading so a write committed meanwhile is replayed by the next query
+    stamp = (get_epoch(), get_version("files"))
+    with get_db() as (conn, cursor):
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")  # One snapshot for the log position and the data
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM tag_index_log")
+        last_seq = cursor.fetchone()[0]
+
+        cursor.execute("SELECT id, uploaded_at FROM files ORDER BY uploaded_at, id")
+        keys = [(row["uploaded_at"], row["id"]) for row in cursor.fetchall()]
+        ordinals = {file_id: n for n, (_, file_id) in enumerate(keys)}
+
+        # Set bits in byte arrays first: OR-ing ints one bit at a time is quadratic
+        width = (len(keys) + 7) // 8
+        buffers = {}
+        cursor.execute("SELECT file_id, tag_id FROM file_tags")
+        for row in cursor.fetchall():
+            n = ordinals.get(row["file_id"])
+            if n is None:
+                continue
+            buf = buffers.get(str(row["tag_id"]))
+            if buf is None:
+                buf = buffers[str(row["tag_id"])] = bytearray(width)
+            buf[n >> 3] |= 1 << (n & 7)
+
+    return {
+        "stamp": stamp,
+        "last_seq": last_seq,
+        "keys": keys,
+        "ids": [file_id for _, file_id in keys],
+        "ordinals": ordinals,
+        "live": (1 << len(keys)) - 1,
+        "bitmaps": {tag: int.from_bytes(buf, "little") for tag, buf in buffers.items()},
+    }
+
+def _insert_file(index, key):
+    """Give a new file the ordinal its (uploaded_at, id) key sorts at and return it."""
+    keys, ids, ordinals = index["keys"], index["ids"], index["ordinals"]
+    n = bisect_left(keys, key)
+    if n < len(keys):
+        # Make room at ordinal n: every bit from n up moves up by one
+        low = (1 << n) - 1
+        for tag_id, bits in index["bitmaps"].items():
+            index["bitmaps"][tag_id] = (bits & low) | ((bits >> n) << (n + 1))
+        index["live"] = (index["live"] & low) | ((index["live"] >> n) << (n + 1))
+        for file_id in ids[n:]:
+            if file_id in ordinals:
+                ordinals[file_id] += 1
+    keys.insert(n, key)
+    ids.insert(n, key[1])
+    ordinals[key[1]] = n
+    index["live"] |= 1 << n
+    return n
+
+def _replay_file(cursor, index, file_id):
+    """Bring an inserted or deleted file in line with the database."""
+    cursor.execute("SELECT uploaded_at FROM files WHERE id = ?", (file_id,))
+    row = cursor.fetchone()
+    n = index["ordinals"].get(file_id)
+    if row is None:
+        if n is not None:
+            del index["ordinals"][file_id]
+            index["live"] &= ~(1 << n)
+        return
+    if n is not None:
+        return  # Already indexed; its tags have log rows of their own
+
+    n = _insert_file(index, (row["uploaded_at"], file_id))
+    cursor.execute("SELECT tag_id FROM file_tags WHERE file_id = ?", (file_id,))
+    for row in cursor.fetchall():
+        tag_id = str(row["tag_id"])
+        index["bitmaps"][tag_id] = index["bitmaps"].get(tag_id, 0) | (1 << n)
+
+def _replay_binding(cursor, index, file_id, tag_id):
+    """Set or clear one file's bit in one tag's bitmap, whichever the database says."""
+    n = index["ordinals"].get(file_id)
+    if n is None:
+        return  # Deleted, or added by a file row that reads all of its tags
+    cursor.execute("SELECT 1 FROM file_tags WHERE file_id = ? AND tag_id = ?", (file_id, tag_id))
+    tag_id = str(tag_id)
+    if cursor.fetchone():
+        index["bitmaps"][tag_id] = index["bitmaps"].get(tag_id, 0) | (1 << n)
+    elif tag_id in index["bitmaps"]:
+        index["bitmaps"][tag_id] &= ~(1 << n)
+        if not index["bitmaps"][tag_id] & index["live"]:
+            del index["bitmaps"][tag_id]
+
+def _catch_up(index, stamp):
+    """
+    Replay the log rows the index has not seen (hold _lock).
+
+    Returns:
+        bool: False if the index is too far behind and must be rebuilt.
+    """
+    with get_db() as (conn, cursor):
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")  # Replay against one snapshot
+        cursor.execute(
+            "SELECT seq, file_id, tag_id FROM tag_index_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (index["last_seq"], CATCH_UP_LIMIT + 1)
+        )
+        rows = cursor.fetchall()
+        if len(rows) > CATCH_UP_LIMIT or (rows and rows[0]["seq"] != index["last_seq"] + 1):
+            return False
+
+        # Replay reads the current state, so each file or binding needs it only once
+        for file_id, tag_id in dict.fromkeys((row["file_id"], row["tag_id"]) for row in rows):
+            if tag_id is None:
+                _replay_file(cursor, index, file_id)
+            else:
+                _replay_binding(cursor, index, file_id, tag_id)
+
+    if rows:
+        index["last_seq"] = rows[-1]["seq"]
+    index["stamp"] = stamp
+    return True
+
+def _current_index():
+    """Return the index caught up with the current "files" version, or None if it needs a rebuild (hold _lock)."""
+    stamp = (get_epoch(), get_version("files"))
+    index = _state["index"]
+    if index is None or index["stamp"][0] != stamp[0]:
+        return None
+    if index["stamp"] == stamp:
+        return index
+    try:
+        if _catch_up(index, stamp):
+            return index
+    except Exception:
+        _state["index"] = None  # Possibly half replayed
+        raise
+    _state["index"] = None
+    return None
+
+def _rebuild_in_background():
+    try:
+        index = _build_index()
+        with _lock:
+            _state["index"] = index
+    finally:
+        _state["building"] = False
+
+def _index_or_rebuild():
+    """Return the current index, or None and start a background rebuild (hold _lock)."""
+    index = _current_index()
+    if index is None and not _state["building"]:
+        _state["building"] = True
+        threading.Thread(target=_rebuild_in_background, name="tag-bitmaps", daemon=True).start()
+    return index
+
+def warm_tag_bitmaps():
+    """Build the index now instead of in the background after the first tag query."""
+    with _lock:
+        if _current_index() is None:
+            _state["index"] = _build_index()
+
+def _drop_highest(bits, count):
+    """Clear the `count` highest set bits of bits."""
+    if count >= bits.bit_count():
+        return 0
+    # Smallest position t such that at most `count` set bits lie at or above t
+    low, high = 0, bits.bit_length()
+    while low < high:
+        mid = (low + high) // 2
+        if (bits >> mid).bit_count() <= count:
+            high = mid
+        else:
+            low = mid + 1
+    return bits & ((1 << low) - 1)
+
+def find_files_with_tags(tag_ids, limit, offset=0, after=None):
+    """
+    Page through the files carrying every given tag, newest first.
+
+    Args:
+        tag_ids (list): Tag IDs the files must all have (ints or numeric strings).
+        limit (int): Maximum number of file IDs to return.
+        offset (int): Number of matches to skip.
+        after (tuple, optional): (uploaded_at, id) of the last file of the previous
+            page; only older files are returned.
+
+    Returns:
+        tuple: (total number of matches, list of file IDs ordered by uploaded_at DESC, id DESC),
+            or None while the index is being rebuilt (answer from SQL instead)
+
+    Example:
+        total, ids = find_files_with_tags([3, 7], limit=21)
+    """
+    with _lock:
+        index = _index_or_rebuild()
+        if index is None:
+            return None
+
+        bits = index["live"]
+        for tag_id in dict.fromkeys(str(t) for t in tag_ids):
+            bits &= index["bitmaps"].get(tag_id, 0)
+            if not bits:
+                break
+        total = bits.bit_count()
+
+        if after:
+            bits &= (1 << bisect_left(index["keys"], tuple(after))) - 1
+        if offset:
+            bits = _drop_highest(bits, offset)
+
+        file_ids = []
+        while bits and len(file_ids) < limit:
+            n = bits.bit_length() - 1
+            bits ^= 1 << n
+            file_ids.append(index["ids"][n])
+
+    return total, file_ids
+
+def _bitmap_of(index, file_ids):
+    """Bitmap of the given files (ids the index does not know are skipped)."""
+    ordinals = index["ordinals"]
+    buf = bytearray((len(index["keys"]) + 7) // 8)
+    for n in map(ordinals.get, file_ids):
+        if n is not None:
+            buf[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(buf, "little")
+
+def count_tags_with(tag_ids, within=None):
+    """
+    Count, for every other tag, the files carrying it and all of tag_ids.
+
+    Args:
+        tag_ids (list): Tag IDs the counted files must all have (may be empty).
+        within (iterable, optional): File IDs to restrict the count to, e.g. the
+            files of a folder filter.
+
+    Returns:
+        dict: tag id (str) -> number of matching files, only tags with at least one match,
+            or None while the index is being rebuilt
+    """
+    wanted = list(dict.fromkeys(str(t) for t in tag_ids))
+    with _lock:
+        index = _index_or_rebuild()
+        if index is None:
+            return None
+        bits = index["live"]
+        if within is not None:
+            bits &= _bitmap_of(index, within)
+        for tag_id in wanted:
+            bits &= index["bitmaps"].get(tag_id, 0)
+        counts = {}
+        if bits:
+            for tag_id, bitmap in index["bitmaps"].items():
+                if tag_id not in wanted:
+                    count = (bits & bitmap).bit_count()
+                    if count:
+                        counts[tag_id] = count
+    return counts
+
+def record_files_changed():
+    """
+    Bump the "files" version after a write to files or file_tags has committed.
+
+    The triggers have already logged what changed; the bump tells every worker
+    (this one included) to replay the log on its next tag query. Writes that
+    only touch file_folders leave the index alone and must not call this.
+    """
+    bump_version("files")
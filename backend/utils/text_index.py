@@ -0,0 +1,114 @@
+import os
+from database import get_db
+from utils.background import get_process_pool
+
+'''
+Full-text index over the text of uploaded PDFs (tables file_text and
+file_text_state, see migrations/m006_file_text.py).
+
+Text is extracted in the shared background process pool after upload; the
+pool process writes the result to the database itself. Extraction uses
+PyMuPDF (pip install pymupdf); without it nothing is indexed and full-text
+search simply finds nothing.
+'''
+
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # Older PyMuPDF releases
+    except ImportError:
+        fitz = None
+
+MAX_INDEXED_CHARS = 2_000_000  # Per file, keeps one huge PDF from bloating the index
+
+def text_extraction_available():
+    """Return True if a PDF text extractor is installed."""
+    return fitz is not None
+
+def extract_text(pdf_path):
+    """Return the text of a PDF's pages joined by newlines (capped at MAX_INDEXED_CHARS)."""
+    parts = []
+    length = 0
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text = page.get_text()
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_INDEXED_CHARS:
+                break
+    return "\n".join(parts)[:MAX_INDEXED_CHARS]
+
+def _store_text(cursor, file_id, status, text=None):
+    """Record the extraction result for a file (no-op if the file was deleted meanwhile)."""
+    cursor.execute("SELECT 1 FROM files WHERE id = ?", (file_id,))
+    if not cursor.fetchone():
+        return
+
+    cursor.execute("""
+        INSERT INTO file_text_state (file_id, status, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(file_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+    """, (file_id, status))
+    cursor.execute("SELECT id FROM file_text_state WHERE file_id = ?", (file_id,))
+    state_id = cursor.fetchone()["id"]
+
+    cursor.execute("DELETE FROM file_text WHERE rowid = ?", (state_id,))
+    if text:
+        cursor.execute("INSERT INTO file_text (rowid, content) VALUES (?, ?)", (state_id, text))
+
+def index_file_text(file_id, pdf_path):
+    """
+    Extract a file's text and store it in the full-text index (runs in a pool process).
+
+    Content shared with an already indexed file (same sha256) is copied instead
+    of being extracted again.
+    """
+    with get_db() as (conn, cursor):
+        cursor.execute("""
+            SELECT ft.content
+            FROM files f
+            JOIN files other ON other.sha256 = f.sha256 AND other.id != f.id
+            JOIN file_text_state s ON s.file_id = other.id AND s.status = 'indexed'
+            JOIN file_text ft ON ft.rowid = s.id
+            WHERE f.id = ?
+            LIMIT 1
+        """, (file_id,))
+        row = cursor.fetchone()
+        if row:
+            _store_text(cursor, file_id, "indexed", row["content"])
+            return
+
+    try:
+        text = extract_text(pdf_path).strip()
+    except Exception:
+        with get_db() as (conn, cursor):
+            _store_text(cursor, file_id, "failed")
+        raise
+
+    with get_db() as (conn, cursor):
+        _store_text(cursor, file_id, "indexed" if text else "empty", text)
+
+def schedule_text_extraction(file_id, pdf_path):
+    """
+    Queue text extraction for a file (no-op if no extractor is installed).
+
+    Call this after the transaction that created the file has committed.
+
+    Returns:
+        Future or None
+    """
+    if not text_extraction_available():
+        return None
+    return get_process_pool().submit(index_file_text, file_id, os.path.abspath(pdf_path))
+
+def remove_file_text(cursor, file_id):
+    """Delete a file's full-text entry (call before deleting the files row)."""
+    cursor.execute("SELECT id FROM file_text_state WHERE file_id = ?", (file_id,))
+    row = cursor.fetchone()
+    if row:
+        cursor.execute("DELETE FROM file_text WHERE rowid = ?", (row["id"],))
+        cursor.execute("DELETE FROM file_text_state WHERE id = ?", (row["id"],))
+
+def build_match_query(q):
+    """Turn user input into an FTS5 query matching it as a phrase (so quotes and operators are literal)."""
+    return '"' + q.replace('"', '""') + '"'
@@ -0,0 +1,115 @@
+import os
+import shutil
+import threading
+from utils.blobstore import UPLOAD_DIR
+from utils.background import get_process_pool
+
+'''
+Background first-page thumbnails for uploaded PDFs.
+
+Rendering runs in the shared background process pool so it never blocks a
+request worker. Results are cached on disk at uploads/thumbnails/<file_id>/<size>.png;
+a file named FAILED in the same folder marks PDFs that could not be rendered.
+
+Rendering uses PyMuPDF (pip install pymupdf). Without it, uploads still work
+and the thumbnail endpoint reports that thumbnails are unavailable.
+'''
+
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # Older PyMuPDF releases
+    except ImportError:
+        fitz = None
+
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
+THUMBNAIL_SIZES = {
+    "small": 128,
+    "medium": 256,
+    "large": 512,
+}
+DEFAULT_THUMBNAIL_SIZE = "medium"
+FAILED_MARKER = "FAILED"
+
+_pending = {}  # file_id -> Future, for renders submitted by this process
+_lock = threading.Lock()
+
+def thumbnails_available():
+    """Return True if a PDF renderer is installed."""
+    return fitz is not None
+
+def thumbnail_path(file_id, size):
+    """Return the cache path of a file's thumbnail at the given size name."""
+    return os.path.join(THUMBNAIL_DIR, file_id, f"{size}.png")
+
+def render_thumbnails(pdf_path, out_dir, sizes):
+    """
+    Render the first page of a PDF as PNGs of the given widths (runs in a pool process).
+
+    Args:
+        pdf_path (str): PDF to render.
+        out_dir (str): Folder to write <size>.png files into.
+        sizes (dict): Size name -> target width in pixels.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        with fitz.open(pdf_path) as doc:
+            page = doc.load_page(0)
+            for name, width in sizes.items():
+                zoom = width / page.rect.width
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                # Write under a temp name so readers never see a partial PNG
+                temp_path = os.path.join(out_dir, f".{name}.{os.getpid()}.png")
+                pixmap.save(temp_path)
+                os.replace(temp_path, os.path.join(out_dir, f"{name}.png"))
+    except Exception:
+        open(os.path.join(out_dir, FAILED_MARKER), "w").close()
+        raise
+
+def _forget(file_id, future):
+    with _lock:
+        if _pending.get(file_id) is future:
+            del _pending[file_id]
+
+def schedule_thumbnails(file_id, pdf_path):
+    """
+    Queue thumbnail rendering for a file (no-op if already queued here or no renderer is installed).
+
+    Call this after the transaction that created the file has committed.
+    """
+    if not thumbnails_available():
+        return
+    with _lock:
+        if file_id in _pending:
+            return
+    future = get_process_pool().submit(
+        render_thumbnails, pdf_path, os.path.join(THUMBNAIL_DIR, file_id), THUMBNAIL_SIZES
+    )
+    with _lock:
+        _pending[file_id] = future
+    future.add_done_callback(lambda f: _forget(file_id, f))
+
+def thumbnail_status(file_id, size):
+    """
+    Report the state of a file's thumbnail.
+
+    Returns:
+        str: "ready", "pending", "failed" or "unavailable"
+    """
+    if os.path.exists(thumbnail_path(file_id, size)):
+        return "ready"
+    if os.path.exists(os.path.join(THUMBNAIL_DIR, file_id, FAILED_MARKER)):
+        return "failed"
+    if not thumbnails_available():
+        return "unavailable"
+    return "pending"
+
+def is_scheduled(file_id):
+    """Return True if this process has a render queued or running for the file."""
+    with _lock:
+        return file_id in _pending
+
+def remove_thumbnails(file_id):
+    """Delete every cached thumbnail of a file."""
+    shutil.rmtree(os.path.join(THUMBNAIL_DIR, file_id), ignore_errors=True)
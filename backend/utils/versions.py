@@ -0,0 +1,91 @@
+import os
+import mmap
+import struct
+import threading
+import database
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+'''
+Cross-process change counters for in-memory caches.
+
+Each name (e.g. "tags") has a monotonically increasing 64-bit counter stored in
+a small file next to the database (<DATABASE_PATH>.versions) that every worker
+process memory-maps. Mutating routes call bump_version() after their
+transaction commits; readers call get_version() - a plain memory read, no SQL -
+and rebuild their cache when the value differs from the one they cached.
+
+Readers must take the version *before* loading from the database, so a write
+that commits during the load is still detected next time.
+
+The first slot holds a random epoch chosen when the file is created, so
+versions stay unique even if the file is deleted and counting restarts.
+'''
+
+VERSION_NAMES = ("tags", "folders", "files")
+_SLOT = struct.Struct("<Q")
+_FILE_SIZE = _SLOT.size * (len(VERSION_NAMES) + 1)
+
+_lock = threading.Lock()
+_state = {"path": None, "pid": None, "fd": None, "map": None}
+
+def _version_file_path():
+    return database.DATABASE_PATH + ".versions"
+
+def _open():
+    """Map the version file for this process (re-done after fork or DATABASE_PATH changes)."""
+    path = _version_file_path()
+    if _state["map"] is not None and _state["path"] == path and _state["pid"] == os.getpid():
+        return _state["map"]
+
+    with _lock:
+        if _state["map"] is not None and _state["path"] == path and _state["pid"] == os.getpid():
+            return _state["map"]
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < _FILE_SIZE:
+                os.ftruncate(fd, _FILE_SIZE)
+                os.pwrite(fd, _SLOT.pack(int.from_bytes(os.urandom(4), "little")), 0)
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        _state.update(path=path, pid=os.getpid(), fd=fd, map=mmap.mmap(fd, _FILE_SIZE))
+        return _state["map"]
+
+def _offset(name):
+    return _SLOT.size * (VERSION_NAMES.index(name) + 1)
+
+def get_epoch():
+    """Return the random epoch of the version file (changes only if the file is recreated)."""
+    return _SLOT.unpack_from(_open(), 0)[0]
+
+def get_version(name):
+    """Return the current change counter for a name (a memory read, no SQL)."""
+    return _SLOT.unpack_from(_open(), _offset(name))[0]
+
+def bump_version(name):
+    """
+    Increment the change counter for a name. Call after the write has committed.
+
+    Returns:
+        int: The new version.
+    """
+    mapped = _open()
+    offset = _offset(name)
+    with _lock:
+        if fcntl:
+            fcntl.flock(_state["fd"], fcntl.LOCK_EX)
+        try:
+            version = _SLOT.unpack_from(mapped, offset)[0] + 1
+            _SLOT.pack_into(mapped, offset, version)
+        finally:
+            if fcntl:
+                fcntl.flock(_state["fd"], fcntl.LOCK_UN)
+    return version